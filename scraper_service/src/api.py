@@ -3,10 +3,10 @@ from typing import Dict, List
 
 from fastapi import FastAPI, HTTPException, Response
 
-from database import ApartmentPhoto, SessionLocal, TelegramApartmentPhoto, create_or_update_user
+from database import ApartmentPhoto, SessionLocal, TelegramApartmentPhoto, create_or_update_user, create_or_update_users
 from database import delete_user_filter as db_delete_user_filter
 from database import get_active_users, get_apartments, get_user_filter, is_user_active, save_user_filter
-from src.models import ApartmentFilter, FullApartmentFilter, RoomSharingFilter, UserFilter, UserUpdate
+from src.models import ApartmentFilter, FullApartmentFilter, RoomSharingFilter, UserFilter, UsersBulkUpdate, UserUpdate
 from utils.city_mapping import CITY_MAPPING
 from utils.rental_types import RentalTypes
 
@@ -86,6 +86,35 @@ async def update_user(user_data: UserUpdate):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/users/bulk")
+async def update_users(users_data: UsersBulkUpdate):
+    """
+    Update several users in one request
+
+    Args:
+        users_data (UsersBulkUpdate): List of user update data
+    """
+    try:
+        create_or_update_users(
+            [
+                {
+                    "user_id": user_data.user_id,
+                    "first_name": user_data.first_name,
+                    "last_name": user_data.last_name,
+                    "is_active": user_data.is_active,
+                    "filter_type": user_data.filter_type
+                    if user_data.is_active
+                    else None,
+                }
+                for user_data in users_data.users
+            ]
+        )
+
+        return {"status": "success"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/users/active")
 async def get_active_user_list():
     """Get list of active users"""
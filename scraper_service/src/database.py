@@ -25,7 +25,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import Mapped, mapped_column, relationship, sessionmaker
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship, sessionmaker
 
 from src.env import DATABASE_URL
 from src.utils.rental_types import RentalTypes
@@ -612,6 +612,51 @@ def cleanup_old_entries() -> None:
         session.close()
 
 
+def _apply_user_update(
+    session: Session,
+    user: Optional[User],
+    user_id: int,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    is_active: bool = True,
+    filter_type: Optional[str] = None,
+) -> User:
+    """
+    Apply user data to an existing user or add a new one to the session
+
+    Args:
+        session (Session): Database session
+        user (Optional[User]): Existing user or None to create a new one
+        user_id (int): Telegram user ID
+        first_name (str, optional): User's first name
+        last_name (str, optional): User's last name
+        is_active (bool): User active status
+        filter_type (str, optional): Type of filter set by user
+
+    Returns:
+        User: Updated or created user
+    """
+    if user:
+        user.is_active = is_active
+        user.updated_at = datetime.utcnow()
+        if first_name is not None:
+            user.first_name = first_name
+        if last_name is not None:
+            user.last_name = last_name
+        if filter_type is not None:
+            user.filter_type = filter_type
+    else:
+        user = User(
+            id=user_id,
+            first_name=first_name,
+            last_name=last_name,
+            is_active=is_active,
+            filter_type=filter_type,
+        )
+        session.add(user)
+    return user
+
+
 def create_or_update_user(
     user_id: int,
     first_name: Optional[str] = None,
@@ -632,24 +677,9 @@ def create_or_update_user(
     session = SessionLocal()
     try:
         user = session.query(User).filter(User.id == user_id).first()
-        if user:
-            user.is_active = is_active
-            user.updated_at = datetime.utcnow()
-            if first_name is not None:
-                user.first_name = first_name
-            if last_name is not None:
-                user.last_name = last_name
-            if filter_type is not None:
-                user.filter_type = filter_type
-        else:
-            user = User(
-                id=user_id,
-                first_name=first_name,
-                last_name=last_name,
-                is_active=is_active,
-                filter_type=filter_type,
-            )
-            session.add(user)
+        _apply_user_update(
+            session, user, user_id, first_name, last_name, is_active, filter_type
+        )
         session.commit()
     except Exception as e:
         logging.error(f"Error creating/updating user: {e}")
@@ -659,6 +689,55 @@ def create_or_update_user(
         session.close()
 
 
+def create_or_update_users(users: List[Dict]) -> None:
+    """
+    Create or update several users in one transaction. Filters of users that
+    become inactive are deleted in the same transaction
+
+    Args:
+        users (List[Dict]): User data with the same fields as create_or_update_user
+    """
+    session = SessionLocal()
+    try:
+        user_ids = [user_data["user_id"] for user_data in users]
+        existing_users = {
+            user.id: user
+            for user in session.query(User).filter(User.id.in_(user_ids)).all()
+        }
+
+        inactive_user_ids = []
+        for user_data in users:
+            user_id = user_data["user_id"]
+            user = _apply_user_update(
+                session,
+                existing_users.get(user_id),
+                user_id,
+                user_data.get("first_name"),
+                user_data.get("last_name"),
+                user_data["is_active"],
+                user_data.get("filter_type"),
+            )
+            existing_users[user_id] = user
+            if not user_data["is_active"]:
+                user.filter_type = None
+                inactive_user_ids.append(user_id)
+
+        # Удаляем фильтры неактивных пользователей одним запросом на каждую таблицу
+        if inactive_user_ids:
+            for filter_model in (FullApartmentFilter, RoomSharingFilter, UserFilter):
+                session.query(filter_model).filter(
+                    filter_model.user_id.in_(inactive_user_ids)
+                ).delete(synchronize_session=False)
+
+        session.commit()
+    except Exception as e:
+        logging.error(f"Error creating/updating users: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
 def get_active_users() -> List[int]:
     """
     Get list of active user IDs
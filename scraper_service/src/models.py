@@ -28,6 +28,12 @@ class UserUpdate(BaseModel):
     filter_type: Optional[str] = None
 
 
+class UsersBulkUpdate(BaseModel):
+    """Model for bulk user update request"""
+
+    users: List[UserUpdate]
+
+
 class BaseUserFilter(BaseModel):
     """Base model for user filter request"""
 
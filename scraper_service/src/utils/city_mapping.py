@@ -20,6 +20,9 @@ CITY_MAPPING = {
     "экибастуз": "ekibastuz",
 }
 
+# Обратный словарь с нормализованными английскими названиями в качестве ключей
+_ENG_TO_RUS = {eng.casefold(): rus.capitalize() for rus, eng in CITY_MAPPING.items()}
+
 
 def get_city_name(eng_name: str) -> str:
     """
@@ -31,7 +34,6 @@ def get_city_name(eng_name: str) -> str:
     Returns:
         str: Русское название города или исходное название, если перевод не найден
     """
-    for rus_name, eng in CITY_MAPPING.items():
-        if eng == eng_name:
-            return rus_name.capitalize()
-    return eng_name
+    if not eng_name:
+        return eng_name
+    return _ENG_TO_RUS.get(eng_name.strip().casefold(), eng_name)
@@ -5,7 +5,11 @@ import requests
 from sqlalchemy.orm import Session
 
 from src.database import ApartmentPhoto
-from src.env import SKIPPED_PHOTO_INDEXES
+from src.env import MAX_PHOTO_BYTES, SKIPPED_PHOTO_INDEXES
+
+
+# Размер блока при чтении тела ответа с фотографией
+PHOTO_CHUNK_SIZE = 64 * 1024
 
 
 class PhotoManager:
@@ -38,57 +42,77 @@ class PhotoManager:
         """
         saved_photo_ids = []
 
-        photos = (
-            session.query(ApartmentPhoto).all()
-        )
+        existing_orders = {
+            order
+            for (order,) in session.query(ApartmentPhoto.order).filter(
+                ApartmentPhoto.apartment_id == apartment_id
+            )
+        }
+
+        # Отбираем фотографии для загрузки до любых сетевых запросов
+        todo = [
+            (i, url)
+            for i, url in enumerate(photo_urls[:max_photos])
+            if i not in self.SKIPPED_PHOTO_INDEXES and i not in existing_orders
+        ]
+        if not todo:
+            logging.debug(f"Все фотографии квартиры {apartment_id} уже загружены")
+            return []
+
+        for i, url in todo:
+            try:
+                with requests.get(url, timeout=10, stream=True) as response:
+                    if not response.ok:
+                        logging.error(
+                            f"Не удалось загрузить фотографию {i+1} для квартиры {apartment_id}. Код статуса: {response.status_code}"
+                        )
+                        continue
 
-        photo_data = dict()
-        for photo in photos:
-            photo_data_tmp = photo_data.get(photo.apartment_id, [])
-            photo_data_tmp.append(photo.order)
-            photo_data[photo.apartment_id] = photo_data_tmp
+                    # Отбрасываем слишком большие фотографии, не скачивая тело ответа
+                    content_length = int(response.headers.get("Content-Length", 0))
+                    if content_length > MAX_PHOTO_BYTES:
+                        logging.warning(
+                            f"Пропущена фотография {i+1} для квартиры {apartment_id}: размер {content_length} байт"
+                        )
+                        continue
 
-        skip_index = 0
-        for i, url in enumerate(photo_urls[:max_photos]):
-            try:
-                response = requests.get(url, timeout=10)
-                if response.ok:
-                    if i in self.SKIPPED_PHOTO_INDEXES:
+                    # Content-Length может отсутствовать или быть неверным, поэтому
+                    # считаем размер при чтении и прерываем загрузку после превышения
+                    chunks = []
+                    size = 0
+                    for chunk in response.iter_content(chunk_size=PHOTO_CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > MAX_PHOTO_BYTES:
+                            break
+                        chunks.append(chunk)
+                    if size > MAX_PHOTO_BYTES:
+                        logging.warning(
+                            f"Пропущена фотография {i+1} для квартиры {apartment_id}: размер больше {MAX_PHOTO_BYTES} байт"
+                        )
                         continue
 
                     # Определяем тип контента из заголовков или используем значение по умолчанию
                     content_type = response.headers.get("Content-Type", "image/jpeg")
+                    photo_data = b"".join(chunks)
+
+                # Создаем новую запись фотографии
+                photo = ApartmentPhoto(
+                    apartment_id=apartment_id,
+                    photo_data=photo_data,
+                    content_type=content_type,
+                    order=i,
+                )
 
-                    photo_indexes = photo_data.get(apartment_id)
-                    if photo_indexes and i in photo_indexes:
-                        skip_index += 1
-                        continue
+                session.add(photo)
+                session.flush()  # Чтобы получить ID
 
-                    # Создаем новую запись фотографии
-                    photo = ApartmentPhoto(
-                        apartment_id=apartment_id,
-                        photo_data=response.content,
-                        content_type=content_type,
-                        order=i,
-                    )
-
-                    session.add(photo)
-                    session.flush()  # Чтобы получить ID
-
-                    saved_photo_ids.append(photo.id)
-                    logging.info(
-                        f"Загружена фотография {i+1} для квартиры {apartment_id}"
-                    )
-                else:
-                    logging.error(
-                        f"Не удалось загрузить фотографию {i+1} для квартиры {apartment_id}. Код статуса: {response.status_code}"
-                    )
+                saved_photo_ids.append(photo.id)
+                logging.info(f"Загружена фотография {i+1} для квартиры {apartment_id}")
             except Exception as e:
                 logging.error(
                     f"Ошибка при загрузке фотографии {i+1} для квартиры {apartment_id}: {e}"
                 )
 
-        logging.debug(f"Скипнул добавление {skip_index} изображений при парсинге.")
         return saved_photo_ids
 
     def get_apartment_photos(
@@ -20,6 +20,9 @@ class RentalTypes:
         ROOM_SHARING: "Подселение",
     }
 
+    # Множество допустимых типов съёма для быстрой проверки
+    ALL_TYPES = frozenset({FULL_APARTMENT, ROOM_SHARING})
+
     @classmethod
     def get_display_name(cls, rental_type: str) -> str:
         """
@@ -67,4 +70,4 @@ class RentalTypes:
         Returns:
             bool: True, если тип валидный
         """
-        return rental_type in cls.get_all_types()
+        return rental_type in cls.ALL_TYPES
@@ -1,19 +1,24 @@
 import asyncio
+import contextlib
+import functools
 import logging
-from typing import Optional
+import re
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
 
-import requests
-from aiogram import Bot, Dispatcher, types
+import aiohttp
+from aiogram import Bot, Dispatcher, F, types
 from aiogram.enums.parse_mode import ParseMode
-from aiogram.filters import Command, StateFilter
+from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.redis import RedisStorage
+from redis.asyncio import BlockingConnectionPool, Redis
 
 from buttons import Buttons
-from filters import UserFilters
+from env import AUTHOR_URL, MAX_MESSAGE_LENGTH, REDIS_HOST, REDIS_PORT, SCRAPER_SERVICE_URL, TELEGRAM_ADMIN_ID
+from filters import UserFilter, UserFilters
 from message_manager import MessageManager
-from src.env import AUTHOR_URL, MAX_MESSAGE_LENGTH, SCRAPER_SERVICE_URL, TELEGRAM_ADMIN_ID
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
 from utils.city_mapping import CITY_MAPPING, get_city_name
 from utils.city_types import CityTypes
 from utils.gender_types import GenderTypes
@@ -21,13 +26,330 @@ from utils.photo_manager import PhotoManager
 from utils.rental_types import RentalTypes
 
 
-user_filters = UserFilters()
+logger = logging.getLogger(__name__)
 
+# Регистрации пользователей отправляются в скрапер пачками
+USER_UPSERT_BATCH_SIZE = 50
+USER_UPSERT_FLUSH_INTERVAL = 0.2
 
-def get_available_cities() -> str:
-    """Получить список доступных городов"""
-    cities = CITY_MAPPING.keys()
-    return "\n".join(f"• `{city.capitalize()}`" for city in cities)
+# Ограничение пула соединений к скраперу
+SCRAPER_MAX_CONNECTIONS = 100
+# Соединения держатся открытыми между запросами, а адрес скрапера кэшируется
+SCRAPER_KEEPALIVE_TIMEOUT = 60
+SCRAPER_DNS_CACHE_TTL = 300
+# Недоступный скрапер должен быстро приводить к ошибке, а не подвешивать обработчики
+SCRAPER_TIMEOUT = 5
+SCRAPER_CONNECT_TIMEOUT = 2
+
+# Незавершенные диалоги настройки фильтра хранятся в Redis не дольше суток
+FSM_STATE_TTL = 24 * 60 * 60
+
+# Апдейты обрабатываются параллельно, но не больше этого числа одновременно
+MAX_CONCURRENT_UPDATES = 100
+
+# Время ожидания апдейтов в одном запросе getUpdates (long polling), в секундах
+POLLING_TIMEOUT = 30
+
+# Шаблон приветствия для /start
+GREETING_TEMPLATE = "Привет{name_suffix}! Я помогу найти квартиру на Krisha.kz\n\n{filter_status}"
+
+# Сообщение после результатов первоначального поиска
+SEARCH_RESULTS_END_TEXT = (
+    "✨ Это все квартиры, которые сейчас есть в нашей базе.\n\n"
+    "🔔 Как только появятся новые объявления, соответствующие вашим критериям поиска, "
+    "вы автоматически получите уведомление прямо в этом чате.\n\n"
+    "💫 Сервис полностью бесплатный!"
+)
+
+# Разбор ввода количества комнат
+ROOMS_RE = re.compile(r"\s*\d+\s*(?:,\s*\d+\s*)*")
+WHITESPACE_TABLE = str.maketrans("", "", " \t")
+MAX_ROOMS_INPUT_LENGTH = 64
+
+# Цена в тенге: цифры, разряды можно разделять пробелами или подчеркиваниями
+PRICE_RE = re.compile(r"\s*\d[\d _]*\s*")
+PRICE_SEPARATORS_TABLE = str.maketrans("", "", " _")
+MAX_PRICE = 10**10
+
+# Количество городов в одном ряду клавиатуры выбора города
+CITY_KEYBOARD_ROW_SIZE = 3
+
+# Сколько разных отрисованных статусов фильтра держать в кэше
+FILTER_STATUS_CACHE_SIZE = 1024
+
+
+def parse_city(text: str) -> str:
+    """Parse city name, keeping the lower-case Russian name used in CITY_MAPPING"""
+    city = text.strip().lower()
+    if city not in CITY_MAPPING:
+        raise ValueError("Unknown city")
+    return city
+
+
+def parse_rooms(text: str) -> List[int]:
+    """Parse comma separated room counts"""
+    if len(text) > MAX_ROOMS_INPUT_LENGTH or not ROOMS_RE.fullmatch(text):
+        raise ValueError("Invalid rooms input")
+    return list(map(int, text.translate(WHITESPACE_TABLE).split(",")))
+
+
+def parse_price(text: str) -> int:
+    """Parse a price in tenge that may contain spaces or underscores between digit groups"""
+    if not PRICE_RE.fullmatch(text):
+        raise ValueError("Invalid price input")
+    price = int(text.translate(PRICE_SEPARATORS_TABLE))
+    if price > MAX_PRICE:
+        raise ValueError("Price is out of range")
+    return price
+
+
+def parse_number(text: str) -> float:
+    """Parse a number that may contain spaces between digit groups"""
+    return float(text.replace(" ", ""))
+
+
+def format_price_range(min_price: Optional[float], max_price: Optional[float]) -> str:
+    """Format price range for the filter preview"""
+    if min_price and max_price:
+        return f"от {int(min_price)} до {int(max_price)} тг"
+    if min_price:
+        return f"от {int(min_price)} тг"
+    if max_price:
+        return f"до {int(max_price)} тг"
+    return "Любая"
+
+
+def filter_step(
+    field: str,
+    parser: Callable[[str], Any],
+    error_text: str,
+    error_keyboard: Optional[types.ReplyKeyboardMarkup] = None,
+    error_parse_mode: Optional[ParseMode] = None,
+):
+    """
+    Decorator for filter setup steps with cancel and skip buttons.
+
+    Handles the cancel button, stores None for the skip button or the parsed
+    value otherwise, and only then calls the step handler to move on
+
+    Args:
+        field (str): State data field filled by the step
+        parser (Callable[[str], Any]): Input parser raising ValueError on bad input
+        error_text (str): Message sent when the input can't be parsed
+        error_keyboard (Optional[types.ReplyKeyboardMarkup], optional): Keyboard for the error message. Defaults to None.
+        error_parse_mode (Optional[ParseMode], optional): Parse mode of the error message. Defaults to None.
+    """
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(self, message: types.Message, state: FSMContext) -> None:
+            if message.text == Buttons.CANCEL:
+                await self.cancel_filter_setup(message, state)
+                return
+
+            if message.text == Buttons.SKIP_FILTER:
+                value = None
+            else:
+                try:
+                    value = parser(message.text)
+                except ValueError:
+                    await self.message_manager.send_message(
+                        self.bot,
+                        message.chat.id,
+                        error_text,
+                        error_keyboard,
+                        parse_mode=error_parse_mode,
+                    )
+                    return
+
+            await state.update_data({field: value})
+            await handler(self, message, state)
+
+        return wrapper
+
+    return decorator
+
+
+# Список доступных городов для подсказок, CITY_MAPPING не меняется во время работы
+AVAILABLE_CITIES = "\n".join(f"• `{city.capitalize()}`" for city in CITY_MAPPING)
+
+
+# Клавиатуры не меняются, поэтому создаем их один раз при импорте
+MAIN_KEYBOARD = types.ReplyKeyboardMarkup(
+    keyboard=[
+        [types.KeyboardButton(text=Buttons.SHOW_FILTER)],
+        [
+            types.KeyboardButton(text=Buttons.SET_FILTER),
+            types.KeyboardButton(text=Buttons.STOP_SEARCH),
+        ],
+        [types.KeyboardButton(text=Buttons.AUTHOR)],
+    ],
+    resize_keyboard=True,
+)
+
+AUTHOR_KEYBOARD = types.InlineKeyboardMarkup(
+    inline_keyboard=[[types.InlineKeyboardButton(text=Buttons.AUTHOR_PROFILE, url=AUTHOR_URL)]]
+)
+
+FILTER_KEYBOARD = types.ReplyKeyboardMarkup(
+    keyboard=[
+        [types.KeyboardButton(text=Buttons.SKIP_FILTER)],
+        [types.KeyboardButton(text=Buttons.CANCEL)],
+    ],
+    resize_keyboard=True,
+)
+
+# Города выбираются кнопками, чтобы не приходилось вводить и исправлять название
+CITIES = list(CITY_MAPPING)
+CITY_KEYBOARD = types.ReplyKeyboardMarkup(
+    keyboard=[
+        [types.KeyboardButton(text=city.capitalize()) for city in CITIES[index : index + CITY_KEYBOARD_ROW_SIZE]]
+        for index in range(0, len(CITIES), CITY_KEYBOARD_ROW_SIZE)
+    ]
+    + [
+        [types.KeyboardButton(text=Buttons.SKIP_FILTER)],
+        [types.KeyboardButton(text=Buttons.CANCEL)],
+    ],
+    resize_keyboard=True,
+)
+
+CONFIRM_KEYBOARD = types.ReplyKeyboardMarkup(
+    keyboard=[
+        [types.KeyboardButton(text=Buttons.CREATE_FILTER)],
+        [types.KeyboardButton(text=Buttons.CANCEL)],
+    ],
+    resize_keyboard=True,
+)
+
+RENTAL_TYPE_KEYBOARD = types.ReplyKeyboardMarkup(
+    keyboard=[
+        [types.KeyboardButton(text=RentalTypes.DISPLAY_NAMES[RentalTypes.FULL_APARTMENT])],
+        [types.KeyboardButton(text=RentalTypes.DISPLAY_NAMES[RentalTypes.ROOM_SHARING])],
+        [types.KeyboardButton(text=Buttons.CANCEL)],
+    ],
+    resize_keyboard=True,
+)
+
+GENDER_KEYBOARD = types.ReplyKeyboardMarkup(
+    keyboard=[
+        [types.KeyboardButton(text=GenderTypes.get_gender_display_name(GenderTypes.MALE))],
+        [types.KeyboardButton(text=GenderTypes.get_gender_display_name(GenderTypes.FEMALE))],
+        [types.KeyboardButton(text=Buttons.CANCEL)],
+    ],
+    resize_keyboard=True,
+)
+
+ROOMMATE_PREFERENCE_KEYBOARD = types.ReplyKeyboardMarkup(
+    keyboard=[
+        [types.KeyboardButton(text=GenderTypes.PREFER_MALE)],
+        [types.KeyboardButton(text=GenderTypes.PREFER_FEMALE)],
+        [types.KeyboardButton(text=GenderTypes.NO_PREFERENCE)],
+        [types.KeyboardButton(text=Buttons.CANCEL)],
+    ],
+    resize_keyboard=True,
+)
+
+ROOMMATE_CITY_KEYBOARD = types.ReplyKeyboardMarkup(
+    keyboard=[
+        [types.KeyboardButton(text=CityTypes.ALMATY)],
+        [types.KeyboardButton(text=CityTypes.ASTANA)],
+        [types.KeyboardButton(text=Buttons.CANCEL)],
+    ],
+    resize_keyboard=True,
+)
+
+
+# Отображаемые в статусе фильтра названия пола и предпочтений по соседям
+GENDER_STATUS_NAMES = {
+    GenderTypes.MALE: "👨 Мужчина",
+    GenderTypes.FEMALE: "👩 Женщина",
+}
+PREFERENCE_STATUS_NAMES = {
+    GenderTypes.PREFER_MALE: "👨 Мужчины",
+    GenderTypes.PREFER_FEMALE: "👩 Женщины",
+    GenderTypes.NO_PREFERENCE: "👨👩 Не имеет значения",
+}
+
+
+@functools.lru_cache(maxsize=FILTER_STATUS_CACHE_SIZE)
+def render_filter_status(filter_data: UserFilter) -> str:
+    """
+    Render filter status message, cached by filter values
+
+    Args:
+        filter_data (UserFilter): Данные фильтра
+
+    Returns:
+        str: Отформатированное сообщение о статусе фильтра
+    """
+    # Город теперь хранится в русском написании
+    city = filter_data.city
+    city = city.capitalize() if city else "Все города"
+
+    # Получаем тип съёма
+    rental_type = filter_data.rental_type
+    rental_type_display = RentalTypes.get_display_preview_name(rental_type) if rental_type else "Не указан"
+
+    lines = ["📋 Текущие фильтры:\n", f"🏠 Тип съёма: {rental_type_display}"]
+
+    # Разные поля в зависимости от типа фильтра
+    if rental_type == RentalTypes.ROOM_SHARING:
+        # Для фильтра подселения
+        gender = filter_data.gender
+        logger.debug("Gender value: %s", gender)
+
+        # Получаем отображаемое имя для пола
+        gender_display = GENDER_STATUS_NAMES.get(gender, "Не указан")
+
+        # Получаем отображаемое имя для предпочтений по соседям
+        roommate_preference = filter_data.roommate_preference
+        logger.debug("Roommate preference value: %s", roommate_preference)
+
+        preference_display = PREFERENCE_STATUS_NAMES.get(roommate_preference, "Не указаны")
+
+        max_price = filter_data.max_price
+
+        lines.append(f"👤 Ваш пол: {gender_display}")
+        lines.append(f"👥 Предпочтения по соседям: {preference_display}")
+        lines.append(f"🏙 Город: {city}")
+
+        price_text = "💰 Цена: Любая цена"
+        if max_price:
+            price_text = f"💰 Цена: до {int(max_price)} тг"
+
+        lines.append(price_text)
+    else:
+        # Для фильтра поиска жилья целиком
+        rooms = filter_data.rooms
+        min_price = filter_data.min_price
+        max_price = filter_data.max_price
+        min_square = filter_data.min_square
+
+        lines.append(f"🏙 Город: {city}")
+
+        if rooms:
+            lines.append(f"🏠 Комнаты: {', '.join(map(str, rooms))}")
+
+        if max_price and min_price:
+            lines.append(f"💰 Цена: {min_price} - {max_price} тг")
+        elif min_price:
+            lines.append(f"💰 Цена: от {min_price} тг")
+        elif max_price:
+            lines.append(f"💰 Цена: до {max_price} тг")
+        else:
+            lines.append("💰 Цена: Любая цена")
+
+        if min_square:
+            min_square_to_show = min_square
+            if int(min_square_to_show) == min_square:
+                min_square_to_show = int(min_square_to_show)
+            lines.append(f"📏 Площадь: от {min_square_to_show} м²")
+
+        else:
+            lines.append("📏 Площадь: Любая площадь")
+
+    lines.append(f"\nЕсли вы хотите изменить фильтр нажмите на кнопку '{Buttons.SET_FILTER}'")
+    return "\n".join(lines)
 
 
 class FilterStates(StatesGroup):
@@ -52,83 +374,6 @@ class RoommateFilterStates(StatesGroup):
     confirming_filters = State()  # Подтверждение фильтра
 
 
-def get_filter_keyboard() -> types.ReplyKeyboardMarkup:
-    """Get keyboard with cancel and skip buttons"""
-    return types.ReplyKeyboardMarkup(
-        keyboard=[
-            [types.KeyboardButton(text=Buttons.SKIP_FILTER)],
-            [types.KeyboardButton(text=Buttons.CANCEL)],
-        ],
-        resize_keyboard=True,
-    )
-
-
-def get_cancel_keyboard() -> types.ReplyKeyboardMarkup:
-    """Get keyboard with cancel button"""
-    return types.ReplyKeyboardMarkup(
-        keyboard=[
-            [types.KeyboardButton(text=Buttons.CANCEL)],
-        ],
-        resize_keyboard=True,
-    )
-
-
-def get_main_keyboard() -> types.ReplyKeyboardMarkup:
-    """Get main menu keyboard"""
-    return types.ReplyKeyboardMarkup(
-        keyboard=[
-            [types.KeyboardButton(text=Buttons.SHOW_FILTER)],
-            [
-                types.KeyboardButton(text=Buttons.SET_FILTER),
-                types.KeyboardButton(text=Buttons.STOP_SEARCH),
-            ],
-            [types.KeyboardButton(text=Buttons.AUTHOR)],
-        ],
-        resize_keyboard=True,
-    )
-
-
-def get_confirm_keyboard() -> types.ReplyKeyboardMarkup:
-    """Get confirmation keyboard"""
-    return types.ReplyKeyboardMarkup(
-        keyboard=[
-            [types.KeyboardButton(text=Buttons.CREATE_FILTER)],
-            [types.KeyboardButton(text=Buttons.CANCEL)],
-        ],
-        resize_keyboard=True,
-    )
-
-
-def get_author_keyboard() -> types.InlineKeyboardMarkup:
-    """Get inline keyboard with author profile link"""
-    keyboard = types.InlineKeyboardMarkup(
-        inline_keyboard=[
-            [types.InlineKeyboardButton(text=Buttons.AUTHOR_PROFILE, url=AUTHOR_URL)]
-        ]
-    )
-    return keyboard
-
-
-def get_rental_type_keyboard() -> types.ReplyKeyboardMarkup:
-    """Get keyboard with rental type options"""
-    return types.ReplyKeyboardMarkup(
-        keyboard=[
-            [
-                types.KeyboardButton(
-                    text=RentalTypes.DISPLAY_NAMES[RentalTypes.FULL_APARTMENT]
-                )
-            ],
-            [
-                types.KeyboardButton(
-                    text=RentalTypes.DISPLAY_NAMES[RentalTypes.ROOM_SHARING]
-                )
-            ],
-            [types.KeyboardButton(text=Buttons.CANCEL)],
-        ],
-        resize_keyboard=True,
-    )
-
-
 class KrishaBot:
     """Telegram bot for Krisha.kz monitoring"""
 
@@ -140,123 +385,195 @@ class KrishaBot:
             token (str): Telegram bot token
         """
         self.bot = Bot(token=token)
-        self.storage = MemoryStorage()
+        self.storage = RedisStorage(
+            Redis(
+                connection_pool=BlockingConnectionPool(
+                    host=REDIS_HOST,
+                    port=REDIS_PORT,
+                    max_connections=MAX_CONCURRENT_UPDATES,
+                )
+            ),
+            state_ttl=FSM_STATE_TTL,
+            data_ttl=FSM_STATE_TTL,
+        )
         self.dp = Dispatcher(storage=self.storage)
-        self.message_manager = MessageManager(admin_id=TELEGRAM_ADMIN_ID)
-        self.photo_manager = PhotoManager()
+        self.http = aiohttp.ClientSession(
+            base_url=SCRAPER_SERVICE_URL,
+            connector=aiohttp.TCPConnector(
+                limit=SCRAPER_MAX_CONNECTIONS,
+                keepalive_timeout=SCRAPER_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=SCRAPER_DNS_CACHE_TTL,
+            ),
+            timeout=aiohttp.ClientTimeout(total=SCRAPER_TIMEOUT, connect=SCRAPER_CONNECT_TIMEOUT),
+        )
+        self.scraper_breaker = CircuitBreaker("Scraper service")
+        # Медленные загрузки фотографий не должны размыкать предохранитель для фильтров и /start
+        self.photo_breaker = CircuitBreaker("Scraper photos")
+        self.photo_manager = PhotoManager(functools.partial(self.scraper_request, breaker=self.photo_breaker))
+        self.message_manager = MessageManager(
+            admin_id=TELEGRAM_ADMIN_ID,
+            on_bot_blocked=self._deactivate_user,
+            on_photos_sent=self.photo_manager.release_photos,
+        )
+        self.user_filters = UserFilters()
+        self._user_queue: asyncio.Queue = asyncio.Queue()
+        self._user_upsert_task: Optional[asyncio.Task] = None
+        # Пачка, уже взятая воркером из очереди, но еще не отправленная в скрапер
+        self._user_batch: List[dict] = []
+        self._updates_semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPDATES)
+        self._background_tasks: Set[asyncio.Task] = set()
+        self.menu_handlers = {
+            Buttons.SHOW_FILTER: self.show_filter_handler,
+            Buttons.AUTHOR: self.author_handler,
+            Buttons.SET_FILTER: self.start_filter_setup,
+            Buttons.STOP_SEARCH: self.stop_search_handler,
+        }
         self.setup_handlers()
 
     def setup_handlers(self) -> None:
         """Setup bot command handlers"""
+        self.dp.update.outer_middleware(self.limit_concurrency)
+
         # Команды
         self.dp.message.register(self.start_handler, Command(commands=["start"]))
 
         # Обработчики кнопок главного меню
-        self.dp.message.register(
-            self.show_filter_handler, lambda msg: msg.text == Buttons.SHOW_FILTER
-        )
-        self.dp.message.register(
-            self.author_handler, lambda msg: msg.text == Buttons.AUTHOR
-        )
-        self.dp.message.register(
-            self.start_filter_setup, lambda msg: msg.text == Buttons.SET_FILTER
-        )
-        self.dp.message.register(
-            self.stop_search_handler, lambda msg: msg.text == Buttons.STOP_SEARCH
-        )
+        self.dp.message.register(self.menu_handler, F.text.in_(self.menu_handlers))
 
         # Обработчики состояний фильтров для жилья целиком
-        self.dp.message.register(
-            self.handle_rental_type, StateFilter(FilterStates.setting_rental_type)
-        )
-        self.dp.message.register(
-            self.handle_city, StateFilter(FilterStates.setting_city)
-        )
-        self.dp.message.register(
-            self.handle_rooms, StateFilter(FilterStates.setting_rooms)
-        )
-        self.dp.message.register(
-            self.handle_min_price, StateFilter(FilterStates.setting_min_price)
-        )
-        self.dp.message.register(
-            self.handle_max_price, StateFilter(FilterStates.setting_max_price)
-        )
-        self.dp.message.register(
-            self.handle_min_square, StateFilter(FilterStates.setting_min_square)
-        )
-        self.dp.message.register(
-            self.process_confirmation, StateFilter(FilterStates.confirming_filters)
-        )
+        self.dp.message.register(self.handle_rental_type, FilterStates.setting_rental_type)
+        self.dp.message.register(self.handle_city, FilterStates.setting_city)
+        self.dp.message.register(self.handle_rooms, FilterStates.setting_rooms)
+        self.dp.message.register(self.handle_min_price, FilterStates.setting_min_price)
+        self.dp.message.register(self.handle_max_price, FilterStates.setting_max_price)
+        self.dp.message.register(self.handle_min_square, FilterStates.setting_min_square)
+        self.dp.message.register(self.process_confirmation, FilterStates.confirming_filters)
 
         # Обработчики состояний фильтров для подселения
-        self.dp.message.register(
-            self.handle_gender, StateFilter(RoommateFilterStates.setting_gender)
-        )
+        self.dp.message.register(self.handle_gender, RoommateFilterStates.setting_gender)
         self.dp.message.register(
             self.handle_roommate_preference,
-            StateFilter(RoommateFilterStates.setting_roommate_preference),
-        )
-        self.dp.message.register(
-            self.handle_roommate_city, StateFilter(RoommateFilterStates.setting_city)
+            RoommateFilterStates.setting_roommate_preference,
         )
+        self.dp.message.register(self.handle_roommate_city, RoommateFilterStates.setting_city)
         self.dp.message.register(
             self.handle_roommate_max_price,
-            StateFilter(RoommateFilterStates.setting_max_price),
+            RoommateFilterStates.setting_max_price,
         )
         self.dp.message.register(
             self.process_roommate_confirmation,
-            StateFilter(RoommateFilterStates.confirming_filters),
+            RoommateFilterStates.confirming_filters,
         )
 
         # Добавляем обработчик изменения статуса бота
         self.dp.my_chat_member.register(self.handle_bot_blocked)
 
+    async def limit_concurrency(
+        self,
+        handler: Callable[[types.Update, Dict[str, Any]], Awaitable[Any]],
+        event: types.Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        """Bound the number of updates handled at the same time"""
+        async with self._updates_semaphore:
+            return await handler(event, data)
+
     async def start_handler(self, message: types.Message) -> None:
         """Handle /start command"""
         user = message.from_user
 
-        # Проверяем наличие URL
-        scraper_url = SCRAPER_SERVICE_URL
-        if not scraper_url:
-            logging.error("SCRAPER_SERVICE_URL is not set")
-            await self.message_manager.send_message(
-                self.bot,
-                message.chat.id,
-                "⚠️ Ошибка конфигурации бота. Пожалуйста, обратитесь к администратору.",
-                get_main_keyboard(),
-            )
-            return
-
         # Регистрируем пользователя в базе
-        try:
-            response = requests.post(
-                f"{scraper_url}/users",
-                json={
-                    "user_id": user.id,
-                    "first_name": user.first_name if user.first_name else None,
-                    "last_name": user.last_name if user.last_name else None,
-                    "is_active": True,
-                },
-            )
-            if not response.ok:
-                logging.error(
-                    f"Failed to register user: {response.status_code} - {response.text}"
-                )
-        except Exception as e:
-            logging.error(f"Error registering user: {e}")
+        self._user_queue.put_nowait(
+            {
+                "user_id": user.id,
+                "first_name": user.first_name if user.first_name else None,
+                "last_name": user.last_name if user.last_name else None,
+                "is_active": True,
+            }
+        )
 
-        user_filter = user_filters.get_filter(user.id)
+        user_filter = await self._get_filter(user.id)
         filter_status = self.format_filter_status(user_filter)
 
         # Формируем приветственное сообщение с именем пользователя, если оно есть
-        greeting = f"Привет{' ' + user.first_name if user.first_name else ''}! "
-        greeting += "Я помогу найти квартиру на Krisha.kz\n\n"
-        greeting += filter_status
-
-        await self.message_manager.send_message(
-            self.bot, message.chat.id, greeting, get_main_keyboard()
+        greeting = GREETING_TEMPLATE.format_map(
+            {
+                "name_suffix": f" {user.first_name}" if user.first_name else "",
+                "filter_status": filter_status,
+            }
         )
 
+        await self.message_manager.send_message(self.bot, message.chat.id, greeting, MAIN_KEYBOARD)
+
+    @contextlib.asynccontextmanager
+    async def scraper_request(
+        self, method: str, path: str, breaker: Optional[CircuitBreaker] = None, **kwargs: Any
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        Send a request to the scraper service through the circuit breaker
+
+        Args:
+            method (str): HTTP method
+            path (str): Path relative to SCRAPER_SERVICE_URL
+            breaker (Optional[CircuitBreaker]): Circuit breaker to use, defaults to scraper_breaker
+
+        Raises:
+            CircuitOpenError: If the scraper service is considered unavailable
+        """
+        breaker = breaker or self.scraper_breaker
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"{breaker.name} is unavailable")
+
+        try:
+            response = await self.http.request(method, path, **kwargs)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            breaker.record_failure()
+            raise
+
+        if response.status >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        try:
+            yield response
+        finally:
+            response.release()
+
+    async def _get_filter(self, user_id: int) -> Optional[UserFilter]:
+        """
+        Get user filter from the local cache, falling back to the scraper service
+        when it has been evicted
+
+        Args:
+            user_id (int): User ID
+
+        Returns:
+            Optional[UserFilter]: Filter data or None if not set
+        """
+        user_filter = self.user_filters.get_filter(user_id)
+        if user_filter is not None:
+            return user_filter
+
+        return await self._refresh_filter(user_id, user_filter)
+
+    async def _delete_user_filters(self, user_id: int) -> None:
+        """
+        Delete user filters in the scraper service, logging failures
+
+        Args:
+            user_id (int): User ID
+        """
+        try:
+            async with self.scraper_request("DELETE", f"/users/{user_id}/filters"):
+                pass
+        except Exception as e:
+            logger.warning("Failed to delete old filter: %s", e)
+
+    async def menu_handler(self, message: types.Message, state: FSMContext) -> None:
+        """Dispatch main menu buttons to their handlers"""
+        await self.menu_handlers[message.text](message, state)
+
     async def start_filter_setup(
         self, message: types.Message, state: FSMContext
     ) -> None:
@@ -270,7 +587,7 @@ class KrishaBot:
                 "1. Жильё целиком - Поиск квартир для аренды полностью\n"
                 "2. Подселение - Поиск комнат или квартир для совместного проживания"
             ),
-            get_rental_type_keyboard(),
+            RENTAL_TYPE_KEYBOARD,
         )
 
     async def handle_rental_type(
@@ -282,74 +599,55 @@ class KrishaBot:
             return
 
         # Определяем выбранный тип съёма
-        if message.text == RentalTypes.DISPLAY_NAMES[RentalTypes.FULL_APARTMENT]:
-            await state.update_data(rental_type=RentalTypes.FULL_APARTMENT)
+        rental_type = RentalTypes.TYPES_BY_DISPLAY_NAME.get(message.text)
+        if rental_type == RentalTypes.FULL_APARTMENT:
+            await state.update_data(rental_type=rental_type)
             await state.set_state(FilterStates.setting_city)
             await self.message_manager.send_message(
                 self.bot,
                 message.chat.id,
                 (
-                    "Введите название города для поиска.\n"
+                    "Выберите город на клавиатуре или введите его название.\n"
                     "Доступные города (нажмите, чтобы скопировать):\n"
-                    f"{get_available_cities()}\n\n"
+                    f"{AVAILABLE_CITIES}\n\n"
                     f"Нажмите на пример, чтобы скопировать его."
                 ),
-                get_cancel_keyboard(),
+                CITY_KEYBOARD,
                 parse_mode=ParseMode.MARKDOWN,
             )
-        elif message.text == RentalTypes.DISPLAY_NAMES[RentalTypes.ROOM_SHARING]:
-            await state.update_data(rental_type=RentalTypes.ROOM_SHARING)
+        elif rental_type == RentalTypes.ROOM_SHARING:
+            await state.update_data(rental_type=rental_type)
             # Начинаем процесс создания фильтра для подселения
             await state.set_state(RoommateFilterStates.setting_gender)
             await self.message_manager.send_message(
                 self.bot,
                 message.chat.id,
                 "Укажите ваш пол:",
-                get_gender_keyboard(),
+                GENDER_KEYBOARD,
             )
         else:
             await self.message_manager.send_message(
                 self.bot,
                 message.chat.id,
                 "Пожалуйста, выберите один из предложенных вариантов.",
-                get_rental_type_keyboard(),
+                RENTAL_TYPE_KEYBOARD,
             )
             return
 
+    @filter_step(
+        "city",
+        parse_city,
+        (
+            "❌ Город не найден. Пожалуйста, выберите город из списка:\n\n"
+            f"{AVAILABLE_CITIES}\n\n"
+            f"Нажмите на пример, чтобы скопировать его.\n"
+            f"Для пропуска этого шага нажмите '{Buttons.SKIP_FILTER}'"
+        ),
+        CITY_KEYBOARD,
+        ParseMode.MARKDOWN,
+    )
     async def handle_city(self, message: types.Message, state: FSMContext) -> None:
         """Handle city input"""
-        if message.text == Buttons.CANCEL:
-            await self.cancel_filter_setup(message, state)
-            return
-
-        if message.text == Buttons.SKIP_FILTER:
-            await state.update_data(city=None)
-        else:
-            # Приводим введенный город к нижнему регистру
-            entered_city = message.text.strip().lower()
-
-            # Проверяем, есть ли город в маппинге
-            if entered_city not in CITY_MAPPING:
-                await self.message_manager.send_message(
-                    self.bot,
-                    message.chat.id,
-                    (
-                        "❌ Город не найден. Пожалуйста, выберите город из списка:\n\n"
-                        f"{get_available_cities()}\n\n"
-                        f"Нажмите на пример, чтобы скопировать его.\n"
-                        f"Для пропуска этого шага нажмите '{Buttons.SKIP_FILTER}'"
-                    ),
-                    get_cancel_keyboard(),
-                    parse_mode=ParseMode.MARKDOWN,
-                )
-                return
-
-            # Сохраняем русское название города
-            await state.update_data(
-                city=entered_city,  # Сохраняем русское название города
-                city_display=entered_city.capitalize(),  # Для отображения пользователю
-            )
-
         await state.set_state(FilterStates.setting_rooms)
         await self.message_manager.send_message(
             self.bot,
@@ -363,30 +661,13 @@ class KrishaBot:
                 "Нажмите на пример, чтобы скопировать его.\n"
                 f"Для пропуска этого шага нажмите '{Buttons.SKIP_FILTER}'"
             ),
-            get_filter_keyboard(),
+            FILTER_KEYBOARD,
             parse_mode=ParseMode.MARKDOWN,
         )
 
+    @filter_step("rooms", parse_rooms, "Неверный формат. Введите числа через запятую.")
     async def handle_rooms(self, message: types.Message, state: FSMContext) -> None:
         """Handle rooms input"""
-        if message.text == Buttons.CANCEL:
-            await self.cancel_filter_setup(message, state)
-            return
-
-        if message.text == Buttons.SKIP_FILTER:
-            await state.update_data(rooms=None)
-        else:
-            try:
-                rooms = [int(r.strip()) for r in message.text.split(",")]
-                await state.update_data(rooms=rooms)
-            except ValueError:
-                await self.message_manager.send_message(
-                    self.bot,
-                    message.chat.id,
-                    "Неверный формат. Введите числа через запятую.",
-                )
-                return
-
         await state.set_state(FilterStates.setting_min_price)
         await self.message_manager.send_message(
             self.bot,
@@ -399,28 +680,13 @@ class KrishaBot:
                 "Нажмите на пример, чтобы скопировать его.\n"
                 f"Для пропуска этого шага нажмите '{Buttons.SKIP_FILTER}'"
             ),
-            get_filter_keyboard(),
+            FILTER_KEYBOARD,
             parse_mode=ParseMode.MARKDOWN,
         )
 
+    @filter_step("min_price", parse_price, "Неверный формат. Введите число.")
     async def handle_min_price(self, message: types.Message, state: FSMContext) -> None:
         """Handle minimum price input"""
-        if message.text == Buttons.CANCEL:
-            await self.cancel_filter_setup(message, state)
-            return
-
-        if message.text == Buttons.SKIP_FILTER:
-            await state.update_data(min_price=None)
-        else:
-            try:
-                min_price = float(message.text.replace(" ", ""))
-                await state.update_data(min_price=min_price)
-            except ValueError:
-                await self.message_manager.send_message(
-                    self.bot, message.chat.id, "Неверный формат. Введите число."
-                )
-                return
-
         await state.set_state(FilterStates.setting_max_price)
         await self.message_manager.send_message(
             self.bot,
@@ -433,28 +699,13 @@ class KrishaBot:
                 "Нажмите на пример, чтобы скопировать его.\n"
                 f"Для пропуска этого шага нажмите '{Buttons.SKIP_FILTER}'"
             ),
-            get_filter_keyboard(),
+            FILTER_KEYBOARD,
             parse_mode=ParseMode.MARKDOWN,
         )
 
+    @filter_step("max_price", parse_price, "Неверный формат. Введите число.")
     async def handle_max_price(self, message: types.Message, state: FSMContext) -> None:
         """Handle maximum price input"""
-        if message.text == Buttons.CANCEL:
-            await self.cancel_filter_setup(message, state)
-            return
-
-        if message.text == Buttons.SKIP_FILTER:
-            await state.update_data(max_price=None)
-        else:
-            try:
-                max_price = float(message.text.replace(" ", ""))
-                await state.update_data(max_price=max_price)
-            except ValueError:
-                await self.message_manager.send_message(
-                    self.bot, message.chat.id, "Неверный формат. Введите число."
-                )
-                return
-
         await state.set_state(FilterStates.setting_min_square)
         await self.message_manager.send_message(
             self.bot,
@@ -467,72 +718,33 @@ class KrishaBot:
                 "Нажмите на пример, чтобы скопировать его.\n"
                 f"Для пропуска этого шага нажмите '{Buttons.SKIP_FILTER}'"
             ),
-            get_filter_keyboard(),
+            FILTER_KEYBOARD,
             parse_mode=ParseMode.MARKDOWN,
         )
 
+    @filter_step("min_square", parse_number, "Неверный формат. Введите число.")
     async def handle_min_square(
         self, message: types.Message, state: FSMContext
     ) -> None:
         """Handle minimum square input"""
-        if message.text == Buttons.CANCEL:
-            await self.cancel_filter_setup(message, state)
-            return
-
-        if message.text == Buttons.SKIP_FILTER:
-            await state.update_data(min_square=None)
-        else:
-            try:
-                min_square = float(message.text.replace(" ", ""))
-                await state.update_data(min_square=min_square)
-            except ValueError:
-                await self.message_manager.send_message(
-                    self.bot, message.chat.id, "Неверный формат. Введите число."
-                )
-                return
-
         # Показываем текущие настройки фильтра
         data = await state.get_data()
-        rental_type_display = RentalTypes.get_display_name(data.get("rental_type", ""))
-
-        # Подготовка данных для превью
-        city_display = data.get("city_display") or "Любой"
-
-        rooms_data = data.get("rooms", [])
-        rooms_display = "Любое количество"
-        if rooms_data:
-            rooms_display = ", ".join(map(str, rooms_data))
-
-        min_price = data.get("min_price")
-        max_price = data.get("max_price")
-
-        price_display = "Любая"
-        if min_price and max_price:
-            price_display = f"от {int(min_price)} до {int(max_price)} тг"
-        elif min_price:
-            price_display = f"от {int(min_price)} тг"
-        elif max_price:
-            price_display = f"до {int(max_price)} тг"
-
-        min_square_data = data.get("min_square")
-        square_display = "Любая"
-        if min_square_data:
-            square_display = f"от {min_square_data} м²"
+        city = data.get("city")
+        rooms = data.get("rooms")
+        min_square = data.get("min_square")
 
         filter_preview = (
             "📋 Проверьте настройки фильтра:\n\n"
-            f"🏠 Тип съёма: {rental_type_display}\n"
-            f"🏙 Город: {city_display}\n"
-            f"🏠 Комнат: {rooms_display}\n"
-            f"💰 Цена: {price_display}\n"
-            f"📏 Площадь: {square_display}\n\n"
+            f"🏠 Тип съёма: {RentalTypes.get_display_name(data.get('rental_type', ''))}\n"
+            f"🏙 Город: {city.capitalize() if city else 'Любой'}\n"
+            f"🏠 Комнат: {', '.join(map(str, rooms)) if rooms else 'Любое количество'}\n"
+            f"💰 Цена: {format_price_range(data.get('min_price'), data.get('max_price'))}\n"
+            f"📏 Площадь: {f'от {min_square} м²' if min_square else 'Любая'}\n\n"
             "Создать фильтр с этими настройками?"
         )
 
         await state.set_state(FilterStates.confirming_filters)
-        await self.message_manager.send_message(
-            self.bot, message.chat.id, filter_preview, get_confirm_keyboard()
-        )
+        await self.message_manager.send_message(self.bot, message.chat.id, filter_preview, CONFIRM_KEYBOARD)
 
     async def process_confirmation(
         self, message: types.Message, state: FSMContext
@@ -543,19 +755,16 @@ class KrishaBot:
             return
 
         if message.text == Buttons.CREATE_FILTER:
-            data = await state.get_data()
             user_id = message.from_user.id
 
-            try:
-                # Сначала удаляем старый фильтр
-                try:
-                    requests.delete(f"{SCRAPER_SERVICE_URL}/users/{user_id}/filters")
-                except Exception as e:
-                    logging.warning(f"Failed to delete old filter: {e}")
+            # Удаляем старый фильтр, параллельно читая данные диалога из хранилища
+            data, _ = await asyncio.gather(state.get_data(), self._delete_user_filters(user_id))
 
+            try:
                 # Сохраняем новый фильтр в базу данных
-                response = requests.post(
-                    f"{SCRAPER_SERVICE_URL}/users/filters",
+                async with self.scraper_request(
+                    "POST",
+                    "/users/filters",
                     json={
                         "user_id": user_id,
                         "city": data.get("city"),
@@ -565,22 +774,26 @@ class KrishaBot:
                         "min_square": data.get("min_square"),
                         "rental_type": data.get("rental_type"),
                     },
-                )
+                ) as response:
+                    saved = response.ok
+                    if not saved:
+                        logger.error(
+                            "Failed to save filter: %s - %s",
+                            response.status,
+                            await response.text(),
+                        )
 
-                if not response.ok:
-                    logging.error(
-                        f"Failed to save filter: {response.status_code} - {response.text}"
-                    )
+                if not saved:
                     await self.message_manager.send_message(
                         bot=self.bot,
                         chat_id=message.chat.id,
                         text="⚠️ Не удалось сохранить фильтры. Пожалуйста, попробуйте позже.",
-                        reply_markup=get_main_keyboard(),
+                        reply_markup=MAIN_KEYBOARD,
                     )
                     return
 
                 # Обновляем локальный фильтр
-                user_filters.set_filter(
+                self.user_filters.set_filter(
                     user_id,
                     city=data.get("city"),
                     rooms=data.get("rooms"),
@@ -595,7 +808,7 @@ class KrishaBot:
                         bot=self.bot,
                         chat_id=message.chat.id,
                         text="✅ Фильтр успешно создан!\n⚙️ Теперь Вы будете получать варианты для подселения.",
-                        reply_markup=get_main_keyboard(),
+                        reply_markup=MAIN_KEYBOARD,
                     )
                     await state.clear()
                     return
@@ -609,8 +822,9 @@ class KrishaBot:
                         else None
                     )
 
-                    response = requests.post(
-                        f"{SCRAPER_SERVICE_URL}/apartments/filter",
+                    async with self.scraper_request(
+                        "POST",
+                        "/apartments/filter",
                         json={
                             "city": search_city,  # Используем английское название для поиска
                             "min_price": data.get("min_price"),
@@ -618,10 +832,10 @@ class KrishaBot:
                             "rooms": data.get("rooms"),
                             "min_square": data.get("min_square"),
                         },
-                    )
+                    ) as response:
+                        apartments = await response.json() if response.ok else None
 
-                    if response.ok:
-                        apartments = response.json()
+                    if apartments is not None:
                         if apartments:
                             # Отправляем результаты поиска
                             await self.send_search_results(message, apartments)
@@ -630,31 +844,31 @@ class KrishaBot:
                                 bot=self.bot,
                                 chat_id=message.chat.id,
                                 text="✅ Фильтр успешно создан!\nТеперь Вы будете получать уведомления о новых квартирах для созданного Вами фильтра!\n\nУдачного поиска!\nЕсли вам понравится данный бот, пожалуйста, рекомендуйте его знакомым 😉.",
-                                reply_markup=get_main_keyboard(),
+                                reply_markup=MAIN_KEYBOARD,
                             )
                     else:
                         await self.message_manager.send_message(
                             bot=self.bot,
                             chat_id=message.chat.id,
                             text="✅ Фильтр успешно создан!\n⚠️ Не удалось выполнить поиск сейчас, но вы будете получать уведомления о новых квартирах.",
-                            reply_markup=get_main_keyboard(),
+                            reply_markup=MAIN_KEYBOARD,
                         )
                 except Exception as e:
-                    logging.error(f"Error in initial search: {e}")
+                    logger.error("Error in initial search: %s", e)
                     await self.message_manager.send_message(
                         bot=self.bot,
                         chat_id=message.chat.id,
                         text="✅ Фильтр успешно создан!\n⚠️ Произошла ошибка при поиске, но вы будете получать уведомления о новых квартирах.",
-                        reply_markup=get_main_keyboard(),
+                        reply_markup=MAIN_KEYBOARD,
                     )
 
             except Exception as e:
-                logging.error(f"Error saving filter: {e}")
+                logger.error("Error saving filter: %s", e)
                 await self.message_manager.send_message(
                     bot=self.bot,
                     chat_id=message.chat.id,
                     text="⚠️ Произошла ошибка при сохранении фильтров.",
-                    reply_markup=get_main_keyboard(),
+                    reply_markup=MAIN_KEYBOARD,
                 )
 
             await state.clear()
@@ -668,13 +882,14 @@ class KrishaBot:
             self.bot,
             message.chat.id,
             "❌ Настройка фильтров отменена",
-            get_main_keyboard(),
+            MAIN_KEYBOARD,
         )
 
-    async def show_filter_handler(self, message: types.Message) -> None:
+    async def show_filter_handler(self, message: types.Message, state: FSMContext) -> None:
         """
         Обработчик команды показа фильтра.
-        Получает фильтр пользователя из локального хранилища и из API-сервиса
+        Сразу отвечает фильтром из локального хранилища и обновляет его из
+        API-сервиса в фоне. Если локального фильтра нет, дожидается ответа API
 
         Args:
             message (types.Message): Сообщение пользователя
@@ -682,70 +897,18 @@ class KrishaBot:
         user_id = message.from_user.id
 
         # Получаем фильтр из локального хранилища
-        local_filter = user_filters.get_filter(user_id)
+        local_filter = self.user_filters.get_filter(user_id)
 
         # Логируем локальный фильтр для отладки
-        logging.info(f"Local filter before API check: {local_filter}")
-
-        # Проверяем наличие URL сервиса
-        scraper_url = SCRAPER_SERVICE_URL
-        if not scraper_url:
-            logging.error("SCRAPER_SERVICE_URL is not set")
-            # Используем только локальный фильтр
-            filter_status = self.format_filter_status(local_filter)
-            await self.message_manager.send_message(
-                bot=self.bot,
-                chat_id=message.chat.id,
-                text=filter_status,
-                reply_markup=get_main_keyboard(),
-            )
-            return
-
-        try:
-            # Запрашиваем фильтр из API-сервиса
-            response = requests.get(f"{scraper_url}/filters/user/{user_id}")
-
-            if response.ok:
-                # Получаем данные из API
-                api_filter = response.json()
-                logging.info(f"API filter: {api_filter}")
-
-                # Проверяем, что данные не пусты и имеют правильную структуру
-                if api_filter and isinstance(api_filter, dict):
-                    # Если локальный фильтр существует, сохраняем значения gender и roommate_preference
-                    gender = local_filter.get("gender") if local_filter else None
-                    roommate_preference = (
-                        local_filter.get("roommate_preference")
-                        if local_filter
-                        else None
-                    )
+        logger.debug("Local filter before API check: %s", local_filter)
 
-                    # Если в API есть эти поля, используем их
-                    if "gender" in api_filter:
-                        gender = api_filter.get("gender")
-                    if "roommate_preference" in api_filter:
-                        roommate_preference = api_filter.get("roommate_preference")
-
-                    # Обновляем локальный фильтр данными из API
-                    user_filters.set_filter(
-                        user_id=user_id,
-                        city=api_filter.get("city"),
-                        rooms=api_filter.get("rooms"),
-                        min_price=api_filter.get("min_price"),
-                        max_price=api_filter.get("max_price"),
-                        min_square=api_filter.get("min_square"),
-                        rental_type=api_filter.get("rental_type"),
-                        gender=gender,
-                        roommate_preference=roommate_preference,
-                    )
-                    local_filter = user_filters.get_filter(user_id)
-                    logging.info(f"Updated local filter: {local_filter}")
-            else:
-                logging.error(
-                    f"Failed to get filter from API: {response.status_code} - {response.text} (endpoint: filters/user/{user_id})"
-                )
-        except Exception as e:
-            logging.error(f"Error getting filter from API: {e}")
+        if local_filter is None:
+            local_filter = await self._refresh_filter(user_id, local_filter)
+        else:
+            # Обновленный фильтр будет показан при следующем запросе
+            task = asyncio.create_task(self._refresh_filter(user_id, local_filter))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
 
         # Формируем сообщение о статусе фильтра
         filter_status = self.format_filter_status(local_filter)
@@ -754,16 +917,74 @@ class KrishaBot:
             bot=self.bot,
             chat_id=message.chat.id,
             text=filter_status,
-            reply_markup=get_main_keyboard(),
+            reply_markup=MAIN_KEYBOARD,
         )
 
-    async def author_handler(self, message: types.Message) -> None:
+    async def _refresh_filter(self, user_id: int, local_filter: Optional[UserFilter]) -> Optional[UserFilter]:
+        """
+        Обновить локальный фильтр пользователя данными из API-сервиса
+
+        Args:
+            user_id (int): ID пользователя
+            local_filter (Optional[UserFilter]): Текущий локальный фильтр
+
+        Returns:
+            Optional[UserFilter]: Обновленный фильтр или прежний, если API недоступен
+        """
+        try:
+            # Запрашиваем фильтр из API-сервиса
+            async with self.scraper_request("GET", f"/filters/user/{user_id}") as response:
+                if response.ok:
+                    # Получаем данные из API
+                    api_filter = await response.json()
+                    logger.debug("API filter: %s", api_filter)
+                else:
+                    api_filter = None
+                    logger.error(
+                        "Failed to get filter from API: %s - %s (endpoint: filters/user/%s)",
+                        response.status,
+                        await response.text(),
+                        user_id,
+                    )
+
+            # Проверяем, что данные не пусты и имеют правильную структуру
+            if api_filter and isinstance(api_filter, dict):
+                # Если локальный фильтр существует, сохраняем значения gender и roommate_preference
+                gender = local_filter.gender if local_filter else None
+                roommate_preference = local_filter.roommate_preference if local_filter else None
+
+                # Если в API есть эти поля, используем их
+                if "gender" in api_filter:
+                    gender = api_filter.get("gender")
+                if "roommate_preference" in api_filter:
+                    roommate_preference = api_filter.get("roommate_preference")
+
+                # Обновляем локальный фильтр данными из API
+                self.user_filters.set_filter(
+                    user_id=user_id,
+                    city=api_filter.get("city"),
+                    rooms=api_filter.get("rooms"),
+                    min_price=api_filter.get("min_price"),
+                    max_price=api_filter.get("max_price"),
+                    min_square=api_filter.get("min_square"),
+                    rental_type=api_filter.get("rental_type"),
+                    gender=gender,
+                    roommate_preference=roommate_preference,
+                )
+                local_filter = self.user_filters.get_filter(user_id)
+                logger.debug("Updated local filter: %s", local_filter)
+        except Exception as e:
+            logger.error("Error getting filter from API: %s", e)
+
+        return local_filter
+
+    async def author_handler(self, message: types.Message, state: FSMContext) -> None:
         """Handle author command"""
         await self.message_manager.send_message(
             self.bot,
             message.chat.id,
             "👨‍💻 Автор бота:",
-            reply_markup=get_author_keyboard(),
+            reply_markup=AUTHOR_KEYBOARD,
         )
 
     async def handle_bot_blocked(self, chat_member: types.ChatMemberUpdated) -> None:
@@ -778,19 +999,14 @@ class KrishaBot:
         is_active = chat_member.new_chat_member.status not in ["kicked", "left"]
 
         try:
-            response = requests.post(
-                f"{SCRAPER_SERVICE_URL}/users",
-                json={
+            self._user_queue.put_nowait(
+                {
                     "user_id": user.id,
                     "first_name": user.first_name if user.first_name else None,
                     "last_name": user.last_name if user.last_name else None,
                     "is_active": is_active,
-                },
+                }
             )
-            if not response.ok:
-                logging.error(
-                    f"Failed to update user block status: {response.status_code} - {response.text}"
-                )
 
             # Если пользователь разблокировал бота, отправляем приветственное сообщение
             if is_active:
@@ -799,46 +1015,38 @@ class KrishaBot:
                     user.id,
                     f"С возвращением{' ' + user.first_name if user.first_name else ''}! "
                     "Я продолжу отправлять вам уведомления о новых квартирах.",
-                    get_main_keyboard(),
+                    MAIN_KEYBOARD,
                 )
             else:
-                user_filters.set_filter(user.id, None, None, None, None)
+                self.user_filters.set_filter(user.id, None, None, None, None)
 
         except Exception as e:
-            logging.error(f"Error updating user block status: {e}")
+            logger.error("Error updating user block status: %s", e)
 
-    async def stop_search_handler(self, message: types.Message) -> None:
+    async def stop_search_handler(self, message: types.Message, state: FSMContext) -> None:
         """Handle stop search command"""
         user_id = message.from_user.id
 
-        # Проверяем наличие URL
-        scraper_url = SCRAPER_SERVICE_URL
-        if not scraper_url:
-            logging.error("SCRAPER_SERVICE_URL is not set")
-            await self.message_manager.send_message(
-                self.bot,
-                message.chat.id,
-                "⚠️ Ошибка конфигурации бота. Пожалуйста, обратитесь к администратору.",
-                get_main_keyboard(),
-            )
-            return
-
         try:
             # Удаляем фильтр из локального хранилища
-            user_filters.set_filter(user_id, None, None, None, None)
+            self.user_filters.set_filter(user_id, None, None, None, None)
 
             # Удаляем фильтр из базы данных
-            response = requests.delete(f"{scraper_url}/users/{user_id}/filters")
+            async with self.scraper_request("DELETE", f"/users/{user_id}/filters") as response:
+                deleted = response.ok
+                if not deleted:
+                    logger.error(
+                        "Failed to delete filter: %s - %s",
+                        response.status,
+                        await response.text(),
+                    )
 
-            if not response.ok:
-                logging.error(
-                    f"Failed to delete filter: {response.status_code} - {response.text}"
-                )
+            if not deleted:
                 await self.message_manager.send_message(
                     self.bot,
                     message.chat.id,
                     "⚠️ Не удалось полностью остановить поиск. Пожалуйста, попробуйте позже.",
-                    get_main_keyboard(),
+                    MAIN_KEYBOARD,
                 )
                 return
 
@@ -846,17 +1054,17 @@ class KrishaBot:
                 self.bot,
                 message.chat.id,
                 "✅ Поиск остановлен.\nВы больше не будете получать уведомления о новых квартирах.",
-                reply_markup=get_main_keyboard(),
+                reply_markup=MAIN_KEYBOARD,
                 parse_mode=ParseMode.MARKDOWN,
             )
 
         except Exception as e:
-            logging.error(f"Error stopping search: {e}")
+            logger.error("Error stopping search: %s", e)
             await self.message_manager.send_message(
                 self.bot,
                 message.chat.id,
                 "⚠️ Произошла ошибка при остановке поиска.",
-                get_main_keyboard(),
+                MAIN_KEYBOARD,
             )
 
     async def send_search_results(
@@ -869,8 +1077,10 @@ class KrishaBot:
             message: Message object
             apartments: List of apartments
         """
-        # Разбиваем квартиры на группы, чтобы сообщение не превышало лимит
-        current_message = "🏠 Найденные квартиры:\n\n"
+        # Разбиваем квартиры на группы, чтобы сообщение не превышало лимит.
+        # Части сообщения собираются в список и склеиваются один раз
+        parts = ["🏠 Найденные квартиры:\n\n"]
+        current_length = len(parts[0])
         messages = []
 
         for apt in apartments:
@@ -884,19 +1094,21 @@ class KrishaBot:
             )
 
             # Если текущее сообщение + новая квартира превысят лимит
-            if len(current_message) + len(apartment_text) > MAX_MESSAGE_LENGTH:
-                messages.append(current_message)
-                current_message = (
-                    "🏠 Найденные квартиры (продолжение):\n\n" + apartment_text
-                )
+            if current_length + len(apartment_text) > MAX_MESSAGE_LENGTH:
+                messages.append("".join(parts))
+                parts = ["🏠 Найденные квартиры (продолжение):\n\n", apartment_text]
+                current_length = len(parts[0]) + len(apartment_text)
             else:
-                current_message += apartment_text
+                parts.append(apartment_text)
+                current_length += len(apartment_text)
 
-        # Добавляем последнее сообщение, если оно не пустое
-        if current_message and current_message != "🏠 Найденные квартиры:\n\n":
-            messages.append(current_message)
+        # Добавляем последнее сообщение, если в нем есть квартиры
+        if len(parts) > 1:
+            messages.append("".join(parts))
 
-        # Отправляем все сообщения
+        # Ставим все сообщения в очередь MessageManager: он соблюдает общий лимит
+        # отправки и отправляет в один чат не чаще раза в секунду, сохраняя
+        # порядок страниц, поэтому отдельная пауза между страницами не нужна
         for i, msg in enumerate(messages, 1):
             if len(messages) > 1:
                 msg += f"\nСтраница {i} из {len(messages)}"
@@ -906,10 +1118,8 @@ class KrishaBot:
             if len(apartments) == 1 and len(messages) == 1:
                 apartment_id = apartments[0].get("id")
                 if apartment_id:
-                    photos = self.photo_manager.get_apartment_photos(apartment_id)
-                    logging.info(
-                        f"Found {len(photos)} photos for apartment {apartment_id}"
-                    )
+                    photos = await self.photo_manager.get_apartment_photos(apartment_id)
+                    logger.info("Found %s photos for apartment %s", len(photos), apartment_id)
 
             await self.message_manager.send_message(
                 bot=self.bot,
@@ -919,137 +1129,109 @@ class KrishaBot:
                 parse_mode=ParseMode.MARKDOWN,
                 photos=photos,
             )
-            # Небольшая пауза между сообщениями
-            if i < len(messages):
-                await asyncio.sleep(0.5)
-
-        notification_text = (
-            "✨ Это все квартиры, которые сейчас есть в нашей базе.\n\n"
-            "🔔 Как только появятся новые объявления, соответствующие вашим критериям поиска, "
-            "вы автоматически получите уведомление прямо в этом чате.\n\n"
-            "💫 Сервис полностью бесплатный!"
-        )
 
         await self.message_manager.send_message(
             bot=self.bot,
             chat_id=message.chat.id,
-            text=notification_text,
-            reply_markup=get_main_keyboard(),
+            text=SEARCH_RESULTS_END_TEXT,
+            reply_markup=MAIN_KEYBOARD,
             parse_mode=ParseMode.MARKDOWN,
         )
 
     async def start(self) -> None:
         """Start the bot with polling"""
+        self._user_upsert_task = asyncio.create_task(self._user_upsert_worker())
+        self.message_manager.start()
         await self.dp.start_polling(
-            self.bot, allowed_updates=["message", "callback_query", "my_chat_member"]
+            self.bot,
+            allowed_updates=["message", "callback_query", "my_chat_member"],
+            handle_as_tasks=True,
+            polling_timeout=POLLING_TIMEOUT,
         )
 
-    def format_filter_status(self, filter_data: Optional[dict]) -> str:
+    async def stop(self) -> None:
+        """Flush pending user updates, remove photo files and close connections to the scraper service and Redis"""
+        if self._user_upsert_task:
+            self._user_upsert_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._user_upsert_task
+        pending, self._user_batch = self._user_batch, []
+        while not self._user_queue.empty():
+            pending.append(self._user_queue.get_nowait())
+        if pending:
+            await self._upsert_users(pending)
+        await self.message_manager.stop()
+        self.photo_manager.remove_photo_files()
+        await self.http.close()
+        await self.storage.close()
+
+    async def _user_upsert_worker(self) -> None:
+        """Collect user updates from the queue and send them to the scraper in batches"""
+        loop = asyncio.get_running_loop()
+        while True:
+            self._user_batch = [await self._user_queue.get()]
+            deadline = loop.time() + USER_UPSERT_FLUSH_INTERVAL
+            while len(self._user_batch) < USER_UPSERT_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                # asyncio.timeout, в отличие от wait_for, не теряет отмену воркера при остановке бота
+                try:
+                    async with asyncio.timeout(timeout):
+                        self._user_batch.append(await self._user_queue.get())
+                except TimeoutError:
+                    break
+            await self._upsert_users(self._user_batch)
+            self._user_batch = []
+
+    def _deactivate_user(self, user_id: int) -> None:
+        """
+        Mark a user who blocked the bot as inactive
+
+        Args:
+            user_id (int): User ID
+        """
+        self._user_queue.put_nowait({"user_id": user_id, "is_active": False})
+
+    async def _upsert_users(self, users: list) -> None:
+        """
+        Send user updates to the scraper with one request
+
+        Args:
+            users (list): User payloads, the latest one wins for the same user
+        """
+        users = list({user["user_id"]: user for user in users}.values())
+        try:
+            async with self.scraper_request("POST", "/users/bulk", json={"users": users}) as response:
+                if not response.ok:
+                    logger.error(
+                        "Failed to update users: %s - %s",
+                        response.status,
+                        await response.text(),
+                    )
+        except Exception as e:
+            logger.error("Error updating users: %s", e)
+
+    def format_filter_status(self, filter_data: Optional[UserFilter]) -> str:
         """
         Format filter status message
 
         Args:
-            filter_data (Optional[dict]): Данные фильтра
+            filter_data (Optional[UserFilter]): Данные фильтра
 
         Returns:
             str: Отформатированное сообщение о статусе фильтра
         """
-        if not filter_data:
+        if filter_data is None:
             return (
                 f"❌ В данный момент фильтры не установлены\n\n"
                 f"Чтобы установить фильтр для поиска жилья нажмите кнопку - {Buttons.SET_FILTER}"
             )
 
         # Логируем данные фильтра для отладки
-        logging.info(f"Filter data: {filter_data}")
-
-        # Город теперь хранится в русском написании
-        city = filter_data.get("city")
-        city = city.capitalize() if city else "Все города"
-
-        # Получаем тип съёма
-        rental_type = filter_data.get("rental_type")
-        rental_type_display = (
-            RentalTypes.get_display_preview_name(rental_type)
-            if rental_type
-            else "Не указан"
-        )
-
-        filter_text = "📋 Текущие фильтры:\n\n"
-        filter_text += f"🏠 Тип съёма: {rental_type_display}\n"
-
-        # Разные поля в зависимости от типа фильтра
-        if rental_type == RentalTypes.ROOM_SHARING:
-            # Для фильтра подселения
-            gender = filter_data.get("gender")
-            logging.info(f"Gender value: {gender}")
+        logger.debug("Filter data: %s", filter_data)
 
-            # Получаем отображаемое имя для пола
-            if gender == GenderTypes.MALE:
-                gender_display = "👨 Мужчина"
-            elif gender == GenderTypes.FEMALE:
-                gender_display = "👩 Женщина"
-            else:
-                gender_display = "Не указан"
-
-            # Получаем отображаемое имя для предпочтений по соседям
-            roommate_preference = filter_data.get("roommate_preference")
-            logging.info(f"Roommate preference value: {roommate_preference}")
-
-            if roommate_preference == GenderTypes.PREFER_MALE:
-                preference_display = "👨 Мужчины"
-            elif roommate_preference == GenderTypes.PREFER_FEMALE:
-                preference_display = "👩 Женщины"
-            elif roommate_preference == GenderTypes.NO_PREFERENCE:
-                preference_display = "👨👩 Не имеет значения"
-            else:
-                preference_display = "Не указаны"
-
-            max_price = filter_data.get("max_price")
-
-            filter_text += f"👤 Ваш пол: {gender_display}\n"
-            filter_text += f"👥 Предпочтения по соседям: {preference_display}\n"
-            filter_text += f"🏙 Город: {city}\n"
-
-            price_text = "💰 Цена: Любая цена\n"
-            if max_price:
-                price_text = f"💰 Цена: до {int(max_price)} тг\n"
-
-            filter_text += price_text
-        else:
-            # Для фильтра поиска жилья целиком
-            rooms = filter_data.get("rooms", "Любое количество")
-            min_price = filter_data.get("min_price", None)
-            max_price = filter_data.get("max_price", None)
-            min_square = filter_data.get("min_square", "Без минимума")
-
-            filter_text += f"🏙 Город: {city}\n"
-
-            if rooms:
-                filter_text += f"🏠 Комнаты: {', '.join(map(str, rooms))}\n"
-
-            if max_price and min_price:
-                filter_text += f"💰 Цена: {min_price} - {max_price} тг\n"
-            elif min_price:
-                filter_text += f"💰 Цена: от {min_price} тг\n"
-            elif max_price:
-                filter_text += f"💰 Цена: до {max_price} тг\n"
-            else:
-                filter_text += "💰 Цена: Любая цена\n"
-
-            if min_square:
-                min_square_to_show = min_square
-                if int(min_square_to_show) == min_square:
-                    min_square_to_show = int(min_square_to_show)
-                filter_text += f"📏 Площадь: от {min_square_to_show} м²\n"
-
-            else:
-                filter_text += "📏 Площадь: Любая площадь\n"
-
-        filter_text += (
-            f"\nЕсли вы хотите изменить фильтр нажмите на кнопку '{Buttons.SET_FILTER}'"
-        )
-        return filter_text
+        return render_filter_status(filter_data)
 
     async def handle_gender(self, message: types.Message, state: FSMContext) -> None:
         """
@@ -1063,19 +1245,15 @@ class KrishaBot:
         if message.text == Buttons.CANCEL:
             await self.cancel_filter_setup(message, state)
             return
-        gender_type_by_display = GenderTypes.get_gender_name_by_display(message.text)
 
         # Проверяем выбор пола с учетом эмодзи
-        if gender_type_by_display == GenderTypes.MALE:
-            gender_value = GenderTypes.MALE
-        elif gender_type_by_display == GenderTypes.FEMALE:
-            gender_value = GenderTypes.FEMALE
-        else:
+        gender_value = GenderTypes.GENDER_NAME_BY_DISPLAY.get(message.text)
+        if gender_value is None:
             await self.message_manager.send_message(
                 self.bot,
                 message.chat.id,
                 "Пожалуйста, выберите пол из предложенных вариантов.",
-                get_gender_keyboard(),
+                GENDER_KEYBOARD,
             )
             return
 
@@ -1085,7 +1263,7 @@ class KrishaBot:
             self.bot,
             message.chat.id,
             "Укажите предпочтения по соседям:",
-            get_roommate_preference_keyboard(),
+            ROOMMATE_PREFERENCE_KEYBOARD,
         )
 
     async def handle_roommate_preference(
@@ -1104,18 +1282,13 @@ class KrishaBot:
             return
 
         # Проверяем выбор предпочтений с учетом эмодзи
-        if message.text == GenderTypes.PREFER_MALE:
-            preference_value = GenderTypes.PREFER_MALE
-        elif message.text == GenderTypes.PREFER_FEMALE:
-            preference_value = GenderTypes.PREFER_FEMALE
-        elif message.text == GenderTypes.NO_PREFERENCE:
-            preference_value = GenderTypes.NO_PREFERENCE
-        else:
+        preference_value = message.text
+        if preference_value not in GenderTypes.PREFERENCE_DISPLAY_NAMES:
             await self.message_manager.send_message(
                 self.bot,
                 message.chat.id,
                 "Пожалуйста, выберите предпочтения из предложенных вариантов.",
-                get_roommate_preference_keyboard(),
+                ROOMMATE_PREFERENCE_KEYBOARD,
             )
             return
 
@@ -1125,7 +1298,7 @@ class KrishaBot:
             self.bot,
             message.chat.id,
             "Выберите город для поиска подселения:",
-            get_roommate_city_keyboard(),
+            ROOMMATE_CITY_KEYBOARD,
         )
 
     async def handle_roommate_city(
@@ -1151,7 +1324,7 @@ class KrishaBot:
                 self.bot,
                 message.chat.id,
                 "Пожалуйста, выберите город из предложенных вариантов.",
-                get_roommate_city_keyboard(),
+                ROOMMATE_CITY_KEYBOARD,
             )
             return
 
@@ -1174,10 +1347,11 @@ class KrishaBot:
                 "Нажмите на пример, чтобы скопировать его.\n"
                 f"Для пропуска этого шага нажмите '{Buttons.SKIP_FILTER}'"
             ),
-            get_filter_keyboard(),
+            FILTER_KEYBOARD,
             parse_mode=ParseMode.MARKDOWN,
         )
 
+    @filter_step("max_price", parse_price, "Неверный формат. Введите число.")
     async def handle_roommate_max_price(
         self, message: types.Message, state: FSMContext
     ) -> None:
@@ -1188,21 +1362,6 @@ class KrishaBot:
             message (types.Message): Сообщение от пользователя
             state (FSMContext): Контекст состояния
         """
-        if message.text == Buttons.CANCEL:
-            await self.cancel_filter_setup(message, state)
-            return
-
-        if message.text == Buttons.SKIP_FILTER:
-            await state.update_data(max_price=None)
-        else:
-            try:
-                max_price = float(message.text.replace(" ", ""))
-                await state.update_data(max_price=max_price)
-            except ValueError:
-                await self.message_manager.send_message(
-                    self.bot, message.chat.id, "Неверный формат. Введите число."
-                )
-                return
 
         # Показываем текущие настройки фильтра подселения
         data = await state.get_data()
@@ -1228,9 +1387,7 @@ class KrishaBot:
         )
 
         await state.set_state(RoommateFilterStates.confirming_filters)
-        await self.message_manager.send_message(
-            self.bot, message.chat.id, filter_preview, get_confirm_keyboard()
-        )
+        await self.message_manager.send_message(self.bot, message.chat.id, filter_preview, CONFIRM_KEYBOARD)
 
     async def process_roommate_confirmation(
         self, message: types.Message, state: FSMContext
@@ -1247,21 +1404,17 @@ class KrishaBot:
             return
 
         if message.text == Buttons.CREATE_FILTER:
-            data = await state.get_data()
             user_id = message.from_user.id
 
+            # Удаляем старый фильтр, параллельно читая данные диалога из хранилища
+            data, _ = await asyncio.gather(state.get_data(), self._delete_user_filters(user_id))
+
             # Логируем данные для отладки
-            logging.info(f"Roommate filter data before saving: {data}")
-            logging.info(f"Gender: {data.get('gender')}")
-            logging.info(f"Roommate preference: {data.get('roommate_preference')}")
+            logger.debug("Roommate filter data before saving: %s", data)
+            logger.debug("Gender: %s", data.get("gender"))
+            logger.debug("Roommate preference: %s", data.get("roommate_preference"))
 
             try:
-                # Сначала удаляем старый фильтр
-                try:
-                    requests.delete(f"{SCRAPER_SERVICE_URL}/users/{user_id}/filters")
-                except Exception as e:
-                    logging.warning(f"Failed to delete old filter: {e}")
-
                 # Подготовка данных для сохранения
                 filter_data = {
                     "user_id": user_id,
@@ -1272,39 +1425,32 @@ class KrishaBot:
                     "rental_type": RentalTypes.ROOM_SHARING,
                 }
 
-                logging.info(f"Sending filter data to API: {filter_data}")
+                logger.debug("Sending filter data to API: %s", filter_data)
 
                 # Сохраняем новый фильтр в базу данных
-                response = requests.post(
-                    f"{SCRAPER_SERVICE_URL}/users/filters",
-                    json=filter_data,
-                )
-
-                if response.ok:
-                    logging.info(
-                        f"API response: {response.status_code} - {response.text}"
-                    )
+                async with self.scraper_request("POST", "/users/filters", json=filter_data) as response:
+                    saved = response.ok
+                    response_text = await response.text()
+                    if saved:
+                        logger.info("API response: %s - %s", response.status, response_text)
+                    else:
+                        logger.error(
+                            "Failed to save filter: %s - %s",
+                            response.status,
+                            response_text,
+                        )
 
-                    # Проверяем, что API вернуло корректный ответ
-                    try:
-                        api_response = response.json()
-                        logging.info(f"API response JSON: {api_response}")
-                    except Exception as e:
-                        logging.warning(f"Failed to parse API response as JSON: {e}")
-                else:
-                    logging.error(
-                        f"Failed to save filter: {response.status_code} - {response.text}"
-                    )
+                if not saved:
                     await self.message_manager.send_message(
                         bot=self.bot,
                         chat_id=message.chat.id,
                         text="⚠️ Не удалось сохранить фильтры. Пожалуйста, попробуйте позже.",
-                        reply_markup=get_main_keyboard(),
+                        reply_markup=MAIN_KEYBOARD,
                     )
                     return
 
                 # Обновляем локальный фильтр
-                user_filters.set_filter(
+                self.user_filters.set_filter(
                     user_id,
                     city=data.get("city"),
                     gender=data.get("gender"),
@@ -1314,84 +1460,24 @@ class KrishaBot:
                 )
 
                 # Проверяем, что фильтр сохранился локально
-                local_filter = user_filters.get_filter(user_id)
-                logging.info(f"Local filter after saving: {local_filter}")
+                local_filter = self.user_filters.get_filter(user_id)
+                logger.debug("Local filter after saving: %s", local_filter)
 
                 # Отправляем сообщение об успешном создании фильтра
                 await self.message_manager.send_message(
                     bot=self.bot,
                     chat_id=message.chat.id,
                     text="✅ Фильтр подселения успешно создан!\nВы будете получать уведомления о новых объявлениях, соответствующих вашему фильтру.",
-                    reply_markup=get_main_keyboard(),
+                    reply_markup=MAIN_KEYBOARD,
                 )
 
             except Exception as e:
-                logging.error(f"Error saving roommate filter: {e}")
+                logger.error("Error saving roommate filter: %s", e)
                 await self.message_manager.send_message(
                     bot=self.bot,
                     chat_id=message.chat.id,
                     text="⚠️ Произошла ошибка при сохранении фильтров.",
-                    reply_markup=get_main_keyboard(),
+                    reply_markup=MAIN_KEYBOARD,
                 )
 
             await state.clear()
-
-
-def get_gender_keyboard() -> types.ReplyKeyboardMarkup:
-    """
-    Получить клавиатуру для выбора пола
-
-    Returns:
-        types.ReplyKeyboardMarkup: Клавиатура с кнопками выбора пола
-    """
-    return types.ReplyKeyboardMarkup(
-        keyboard=[
-            [
-                types.KeyboardButton(
-                    text=GenderTypes.get_gender_display_name(GenderTypes.MALE)
-                )
-            ],
-            [
-                types.KeyboardButton(
-                    text=GenderTypes.get_gender_display_name(GenderTypes.FEMALE)
-                )
-            ],
-            [types.KeyboardButton(text=Buttons.CANCEL)],
-        ],
-        resize_keyboard=True,
-    )
-
-
-def get_roommate_preference_keyboard() -> types.ReplyKeyboardMarkup:
-    """
-    Получить клавиатуру для выбора предпочтений по соседям
-
-    Returns:
-        types.ReplyKeyboardMarkup: Клавиатура с кнопками выбора предпочтений
-    """
-    return types.ReplyKeyboardMarkup(
-        keyboard=[
-            [types.KeyboardButton(text=GenderTypes.PREFER_MALE)],
-            [types.KeyboardButton(text=GenderTypes.PREFER_FEMALE)],
-            [types.KeyboardButton(text=GenderTypes.NO_PREFERENCE)],
-            [types.KeyboardButton(text=Buttons.CANCEL)],
-        ],
-        resize_keyboard=True,
-    )
-
-
-def get_roommate_city_keyboard() -> types.ReplyKeyboardMarkup:
-    """
-    Получить клавиатуру для выбора города для подселения
-
-    Returns:
-        types.ReplyKeyboardMarkup: Клавиатура с кнопками выбора города
-    """
-    return types.ReplyKeyboardMarkup(
-        keyboard=[
-            [types.KeyboardButton(text=CityTypes.ALMATY)],
-            [types.KeyboardButton(text=CityTypes.ASTANA)],
-            [types.KeyboardButton(text=Buttons.CANCEL)],
-        ],
-        resize_keyboard=True,
-    )
@@ -24,6 +24,12 @@ SCRAPER_SERVICE_URL: str = os.environ.get("SCRAPER_SERVICE_URL", "")
 REDIS_HOST: str = os.environ.get("REDIS_HOST", "redis")
 REDIS_PORT: int = int(os.environ.get("REDIS_PORT", "6379"))
 
+# Каталог для временных файлов фотографий: по умолчанию tmpfs в памяти, если в него
+# можно писать, иначе системный каталог временных файлов
+PHOTOS_TEMP_DIR: Optional[str] = os.environ.get(
+    "PHOTOS_TEMP_DIR", "/dev/shm" if os.access("/dev/shm", os.W_OK) else None
+)
+
 # Прочие настройки
 AUTHOR_URL: Optional[str] = os.environ.get("AUTHOR_URL", None)
 
@@ -1,13 +1,46 @@
 import logging
-from typing import Dict, List, Optional
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+FILTERS_MAX_SIZE = 100_000
+FILTERS_TTL = 24 * 60 * 60
+
+
+@dataclass(frozen=True, slots=True)
+class UserFilter:
+    """User filter values"""
+
+    city: Optional[str] = None
+    rooms: Optional[Tuple[int, ...]] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_square: Optional[float] = None
+    rental_type: Optional[str] = None
+    gender: Optional[str] = None
+    roommate_preference: Optional[str] = None
 
 
 class UserFilters:
     """Class for storing user filters"""
 
-    def __init__(self):
-        """Initialize empty filters dictionary"""
-        self.filters: Dict[int, dict] = {}
+    def __init__(self, maxsize: int = FILTERS_MAX_SIZE, ttl: float = FILTERS_TTL):
+        """
+        Initialize empty filters cache
+
+        Args:
+            maxsize (int, optional): Maximum number of stored filters. Defaults to FILTERS_MAX_SIZE.
+            ttl (float, optional): Filter lifetime in seconds. Defaults to FILTERS_TTL.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # Фильтры неактивных пользователей вытесняются по LRU и TTL,
+        # при необходимости они заново загружаются из API-сервиса
+        self.filters: "OrderedDict[int, Tuple[float, UserFilter]]" = OrderedDict()
 
     def set_filter(
         self,
@@ -48,31 +81,34 @@ class UserFilters:
                 roommate_preference,
             ]
         ):
-            if user_id in self.filters:
-                del self.filters[user_id]
+            self.filters.pop(user_id, None)
             return
 
         # Логируем значения для отладки
-        logging.info(f"Setting filter for user {user_id}")
-        logging.info(f"Gender: {gender}")
-        logging.info(f"Roommate preference: {roommate_preference}")
+        logger.debug("Setting filter for user %s", user_id)
+        logger.debug("Gender: %s", gender)
+        logger.debug("Roommate preference: %s", roommate_preference)
 
         # Создаем или обновляем фильтр
-        self.filters[user_id] = {
-            "city": city,
-            "rooms": rooms,
-            "min_price": min_price,
-            "max_price": max_price,
-            "min_square": min_square,
-            "rental_type": rental_type,
-            "gender": gender,
-            "roommate_preference": roommate_preference,
-        }
+        user_filter = UserFilter(
+            city=city,
+            rooms=tuple(rooms) if rooms is not None else None,
+            min_price=min_price,
+            max_price=max_price,
+            min_square=min_square,
+            rental_type=rental_type,
+            gender=gender,
+            roommate_preference=roommate_preference,
+        )
+        self.filters[user_id] = (time.monotonic() + self.ttl, user_filter)
+        self.filters.move_to_end(user_id)
+        while len(self.filters) > self.maxsize:
+            self.filters.popitem(last=False)
 
         # Логируем сохраненный фильтр
-        logging.info(f"Filter saved: {self.filters[user_id]}")
+        logger.debug("Filter saved: %s", user_filter)
 
-    def get_filter(self, user_id: int) -> Optional[dict]:
+    def get_filter(self, user_id: int) -> Optional[UserFilter]:
         """
         Get filter for user
 
@@ -80,6 +116,16 @@ class UserFilters:
             user_id (int): User ID
 
         Returns:
-            Optional[dict]: Filter data or None if not set
+            Optional[UserFilter]: Filter data or None if not set
         """
-        return self.filters.get(user_id)
+        entry = self.filters.get(user_id)
+        if entry is None:
+            return None
+
+        expires_at, user_filter = entry
+        if expires_at < time.monotonic():
+            del self.filters[user_id]
+            return None
+
+        self.filters.move_to_end(user_id)
+        return user_filter
@@ -1,44 +1,60 @@
 import asyncio
 import logging
-
-from aiogram import Bot
-from dotenv import load_dotenv
+import logging.handlers
+import queue
 
 from bot import KrishaBot
-from env import TELEGRAM_BOT_TOKEN, TELEGRAM_ADMIN_ID
-from message_manager import MessageManager
+from env import SCRAPER_SERVICE_URL, TELEGRAM_BOT_TOKEN
 from notifications import NotificationHandler
 
 
 async def main():
     """Main function"""
-    load_dotenv()
-
-    # Настройка логирования
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    )
+    # Настройка логирования: обработчики пишут записи в очередь, а вывод в поток
+    # выполняется в отдельном потоке QueueListener и не блокирует event loop
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    log_listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    log_listener.start()
 
     if not TELEGRAM_BOT_TOKEN:
         raise ValueError("TELEGRAM_BOT_TOKEN environment variable is not set")
+    if not SCRAPER_SERVICE_URL:
+        raise ValueError("SCRAPER_SERVICE_URL environment variable is not set")
 
-    bot = Bot(token=TELEGRAM_BOT_TOKEN)
-    message_manager = MessageManager(admin_id=TELEGRAM_ADMIN_ID)
-    notification_handler = NotificationHandler(message_manager, bot)
+    # Уведомления отправляются через те же Bot, MessageManager и PhotoManager, что и
+    # ответы бота, чтобы ограничение скорости отправки и кэш фотографий были общими
+    krisha_bot = KrishaBot(TELEGRAM_BOT_TOKEN)
+    notification_handler = NotificationHandler(krisha_bot.message_manager, krisha_bot.bot, krisha_bot.photo_manager)
 
     # Подключаемся к Redis перед запуском
     await notification_handler.connect()
 
-    krisha_bot = KrishaBot(TELEGRAM_BOT_TOKEN)
-
+    # Поллинг завершается сам по SIGINT/SIGTERM (aiogram обрабатывает сигналы),
+    # после этого или после падения любой из задач останавливаем обе
+    tasks = [
+        asyncio.create_task(krisha_bot.start()),
+        asyncio.create_task(notification_handler.start()),
+    ]
     try:
-        await asyncio.gather(krisha_bot.start(), notification_handler.start())
-    except Exception as e:
-        logging.error(f"Error running bot: {e}")
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.cancelled():
+                continue
+            exc = task.exception()
+            if exc:
+                logging.error("Error running bot: %s", exc)
     finally:
-        await notification_handler.disconnect()
-        await bot.session.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.gather(krisha_bot.stop(), notification_handler.disconnect(), return_exceptions=True)
+        await krisha_bot.bot.session.close()
+        log_listener.stop()
 
 
 if __name__ == "__main__":
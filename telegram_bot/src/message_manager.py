@@ -1,37 +1,92 @@
 import asyncio
+import contextlib
+import itertools
 import logging
 import os
 import time
-from collections import deque
-from typing import List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
 
-import requests
 from aiogram import Bot, types
 from aiogram.enums.parse_mode import ParseMode
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
 from aiogram.types import FSInputFile
 
-from env import SCRAPER_SERVICE_URL
+
+logger = logging.getLogger(__name__)
+
+# Общий лимит Telegram Bot API - около 30 сообщений в секунду, оставляем запас
+MESSAGES_PER_SECOND = 25
+
+# Telegram не рекомендует отправлять в один чат больше одного сообщения в секунду
+PER_CHAT_INTERVAL = 1.0
+
+# Размер словаря времени отправки по чатам, после которого из него удаляются
+# чаты, в которые уже снова можно отправлять
+CHAT_SEND_TIMES_PRUNE_SIZE = 10_000
+
+# Приоритеты сообщений в очереди: сообщения админу отправляются первыми
+ADMIN_PRIORITY = 0
+REGULAR_PRIORITY = 1
+
+# Максимальный размер очереди, при переполнении отправители ждут
+MESSAGE_QUEUE_MAX_SIZE = 1000
 
 
 class MessageManager:
     """Manager for handling message sending with rate limiting and priorities"""
 
-    def __init__(self ,admin_id: int, messages_per_second: int = 3):
+    def __init__(
+        self,
+        admin_id: int,
+        messages_per_second: int = MESSAGES_PER_SECOND,
+        on_bot_blocked: Optional[Callable[[int], None]] = None,
+        on_photos_sent: Optional[Callable[[List[str]], None]] = None,
+    ):
         """
         Initialize message manager
 
         Args:
             messages_per_second (int): Maximum messages per second
             admin_id (int): Telegram ID of admin user
+            on_bot_blocked (Optional[Callable[[int], None]]): Called with the chat ID
+                when a user has blocked the bot
+            on_photos_sent (Optional[Callable[[List[str]], None]]): Called with the photo
+                paths of a message once it has been sent or has failed
         """
         self.messages_per_second = messages_per_second
         self.admin_id = admin_id
-        self.regular_queue = deque()
-        self.admin_queue = deque()
-        self.last_send_time = time.time()
-        self.messages_sent = 0
-        self.lock = asyncio.Lock()
-        self.processing = False
+        self.on_bot_blocked = on_bot_blocked
+        self.on_photos_sent = on_photos_sent
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue(
+            maxsize=MESSAGE_QUEUE_MAX_SIZE
+        )
+        # Порядковый номер сохраняет очередность сообщений с одинаковым приоритетом
+        self._sequence = itertools.count()
+        self._sender_task: Optional[asyncio.Task] = None
+        # Token bucket: токены пополняются со скоростью messages_per_second,
+        # но их не больше, чем на одну секунду отправки
+        self.tokens = float(messages_per_second)
+        self.last_refill = time.monotonic()
+        # Время, начиная с которого в чат можно отправить следующее сообщение
+        self._chat_next_send: Dict[int, float] = {}
+        # Задачи, возвращающие отложенные сообщения в очередь
+        self._requeue_tasks: Set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Start the background task that sends queued messages"""
+        if self._sender_task is None:
+            self._sender_task = asyncio.create_task(self._process_queue())
+
+    async def stop(self) -> None:
+        """Stop the background sender task"""
+        for task in self._requeue_tasks:
+            task.cancel()
+        self._requeue_tasks.clear()
+        if self._sender_task is not None:
+            self._sender_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._sender_task
+            self._sender_task = None
 
     async def send_message(
         self,
@@ -61,49 +116,68 @@ class MessageManager:
             "photos": photos,
         }
 
-        # Добавляем сообщение в соответствующую очередь
-        if chat_id == self.admin_id:
-            self.admin_queue.append(message_data)
-        else:
-            self.regular_queue.append(message_data)
+        # Сообщения админу получают более высокий приоритет
+        priority = ADMIN_PRIORITY if chat_id == self.admin_id else REGULAR_PRIORITY
+        await self.queue.put((priority, next(self._sequence), bot, message_data))
 
-        # Запускаем обработку очереди, если она еще не запущена
-        if not self.processing:
-            self.processing = True
-            asyncio.create_task(self._process_queues(bot))
+    async def _process_queue(self) -> None:
+        """Send queued messages one by one with rate limiting"""
+        while True:
+            item = await self.queue.get()
+            _, _, bot, message_data = item
 
-    async def _process_queues(self, bot: Bot) -> None:
-        """Process message queues with rate limiting"""
-        try:
-            while self.admin_queue or self.regular_queue:
-                async with self.lock:
-                    current_time = time.time()
-
-                    # Сбрасываем счетчик каждую секунду
-                    if current_time - self.last_send_time >= 1:
-                        self.messages_sent = 0
-                        self.last_send_time = current_time
-
-                    # Если достигнут лимит, ждем следующей секунды
-                    if self.messages_sent >= self.messages_per_second:
-                        await asyncio.sleep(1)
-                        continue
-
-                    # Сначала обрабатываем сообщения для админа
-                    if self.admin_queue:
-                        message_data = self.admin_queue.popleft()
-                        await self._send_message(bot, **message_data)
-                        self.messages_sent += 1
-                    # Затем обрабатываем обычные сообщения
-                    elif self.regular_queue:
-                        message_data = self.regular_queue.popleft()
-                        await self._send_message(bot, **message_data)
-                        self.messages_sent += 1
-
-                # Небольшая пауза между отправками
-                await asyncio.sleep(0.1)
-        finally:
-            self.processing = False
+            # Если в этот чат недавно отправляли, откладываем сообщение, не
+            # задерживая сообщения в другие чаты
+            delay = (
+                self._chat_next_send.get(message_data["chat_id"], 0) - time.monotonic()
+            )
+            if delay > 0:
+                self._requeue_later(item, delay)
+                continue
+
+            await self._wait_for_token()
+            self._reserve_chat(message_data["chat_id"])
+            await self._send_message(bot, **message_data)
+
+    def _requeue_later(self, item: tuple, delay: float) -> None:
+        """Put a postponed message back to the queue after the delay"""
+
+        async def requeue() -> None:
+            await asyncio.sleep(delay)
+            # Сообщение сохраняет свой приоритет и порядковый номер
+            await self.queue.put(item)
+
+        task = asyncio.create_task(requeue())
+        self._requeue_tasks.add(task)
+        task.add_done_callback(self._requeue_tasks.discard)
+
+    def _reserve_chat(self, chat_id: int) -> None:
+        """Remember when the next message may be sent to the chat"""
+        now = time.monotonic()
+        if len(self._chat_next_send) >= CHAT_SEND_TIMES_PRUNE_SIZE:
+            self._chat_next_send = {
+                chat: next_send
+                for chat, next_send in self._chat_next_send.items()
+                if next_send > now
+            }
+        self._chat_next_send[chat_id] = now + PER_CHAT_INTERVAL
+
+    async def _wait_for_token(self) -> None:
+        """Wait until the token bucket allows sending one more message"""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(
+                self.messages_per_second,
+                self.tokens + (now - self.last_refill) * self.messages_per_second,
+            )
+            self.last_refill = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            # Если токенов нет, ждем ровно до появления следующего
+            await asyncio.sleep((1 - self.tokens) / self.messages_per_second)
 
     async def _send_message(
         self,
@@ -118,12 +192,16 @@ class MessageManager:
         try:
             # Если есть фотографии, отправляем их с текстом
             if photos and len(photos) > 0:
-                # Проверяем, что файлы существуют
-                valid_photos = [p for p in photos if os.path.exists(p)]
+                # Проверяем, что файлы существуют, в отдельном потоке, чтобы
+                # обращения к диску не блокировали event loop
+                valid_photos = await asyncio.to_thread(
+                    lambda: [p for p in photos if os.path.exists(p)]
+                )
 
-                if valid_photos or text.count("🏠") == 1:
+                if valid_photos:
                     # Отправляем одну фотографию с текстом для одной квартиры
-                    await bot.send_photo(
+                    await self._call_api(
+                        bot.send_photo,
                         chat_id=chat_id,
                         photo=FSInputFile(valid_photos[0]),
                         caption=text
@@ -135,7 +213,8 @@ class MessageManager:
 
                     # Если текст не поместился в подпись к фото, отправляем его отдельно
                     if len(text) > 1024:
-                        await bot.send_message(
+                        await self._call_api(
+                            bot.send_message,
                             chat_id=chat_id,
                             text=text,
                             reply_markup=reply_markup,
@@ -143,7 +222,8 @@ class MessageManager:
                         )
                 else:
                     # Если фотографии не найдены, отправляем только текст
-                    await bot.send_message(
+                    await self._call_api(
+                        bot.send_message,
                         chat_id=chat_id,
                         text=text,
                         reply_markup=reply_markup,
@@ -151,24 +231,33 @@ class MessageManager:
                     )
             else:
                 # Отправляем обычное текстовое сообщение
-                await bot.send_message(
+                await self._call_api(
+                    bot.send_message,
                     chat_id=chat_id,
                     text=text,
                     reply_markup=reply_markup,
                     parse_mode=parse_mode,
                 )
         except Exception as e:
-            if "Forbidden: bot was blocked by the user" in str(e):
+            if isinstance(e, TelegramForbiddenError) and self.on_bot_blocked:
                 # Если пользователь заблокировал бота, обновляем его статус
-                try:
-                    response = requests.post(
-                        f"{SCRAPER_SERVICE_URL}/users",
-                        json={"user_id": chat_id, "is_active": False},
-                    )
-                    if not response.ok:
-                        logging.error(
-                            f"Failed to update user block status: {response.status_code} - {response.text}"
-                        )
-                except Exception as update_error:
-                    logging.error(f"Error updating user block status: {update_error}")
-            logging.error(f"Error sending message: {e}")
+                self.on_bot_blocked(chat_id)
+            logger.error("Error sending message: %s", e)
+        finally:
+            # Файлы фотографий больше не нужны этому сообщению
+            if photos and self.on_photos_sent:
+                self.on_photos_sent(photos)
+
+    @staticmethod
+    async def _call_api(method: Callable[..., Awaitable[Any]], **kwargs: Any) -> None:
+        """Call a Bot API method, retrying once after Telegram flood control"""
+        try:
+            await method(**kwargs)
+        except TelegramRetryAfter as e:
+            logger.warning(
+                "Flood control for chat %s, retrying in %s s",
+                kwargs.get("chat_id"),
+                e.retry_after,
+            )
+            await asyncio.sleep(e.retry_after)
+            await method(**kwargs)
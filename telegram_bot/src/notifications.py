@@ -1,27 +1,48 @@
-import asyncio
 import json
 import logging
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from aiogram.enums.parse_mode import ParseMode
 from redis.asyncio import Redis
 
 from env import MAX_MESSAGE_LENGTH, REDIS_HOST, REDIS_PORT, TELEGRAM_PARSE_GROUP_DICT
 from message_manager import MessageManager
-from src.utils.rental_types import RentalTypes
 from utils.photo_manager import PhotoManager
+from utils.rental_types import RentalTypes
+
+
+logger = logging.getLogger(__name__)
+
+# Сколько уже пришедших уведомлений забирать из pubsub за раз для объединения
+NOTIFICATIONS_BATCH_SIZE = 100
+
+# Интервал проверки соединения с Redis для долгоживущей подписки, в секундах
+REDIS_HEALTH_CHECK_INTERVAL = 30
+
+# Заголовки уведомлений, city_suffix - CITY_SUFFIX_TEMPLATE или пустая строка
+NEW_APARTMENT_HEADER = "🆕 Новая квартира по вашим критериям{city_suffix}:\n\n"
+NEW_APARTMENTS_HEADER = "🆕 Новые квартиры по вашим критериям{city_suffix}:\n\n"
+CITY_SUFFIX_TEMPLATE = " в городе **{city_name}**"
+NEW_ROOM_SHARING_HEADER = "🆕 Новое объявление о подселении по вашим критериям:\n\n"
+NEW_ROOM_SHARINGS_HEADER = (
+    "🆕 Найдены новые объявления о подселении по вашим критериям:\n\n"
+)
+ROOM_SHARINGS_CONTINUATION_HEADER = "🆕 Новые объявления о подселении (продолжение):\n\n"
 
 
 class NotificationHandler:
     """Handler for apartment notifications"""
 
-    def __init__(self, message_manager: MessageManager, bot):
+    def __init__(
+        self, message_manager: MessageManager, bot, photo_manager: PhotoManager
+    ):
         """
         Initialize notification handler
 
         Args:
             message_manager (MessageManager): Message manager instance
             bot: Bot instance
+            photo_manager (PhotoManager): Photo manager instance
         """
         self.redis_host = REDIS_HOST
         self.redis_port = REDIS_PORT
@@ -29,19 +50,26 @@ class NotificationHandler:
         self.message_manager = message_manager
         self.bot = bot
         self.running = False
-        self.photo_manager = PhotoManager()
-        self.scraper_service_url = "http://localhost:8000"  # Assuming a default URL
+        self.photo_manager = photo_manager
+        # Тексты квартир, уже отформатированные в текущей пачке уведомлений
+        self.apartment_texts: Dict[Tuple[str, Any], str] = {}
 
     async def connect(self):
         """Connect to Redis"""
         try:
+            # Подписка держит соединение открытым долго, поэтому включаем
+            # keepalive и периодическую проверку соединения
             self.redis = Redis(
-                host=self.redis_host, port=self.redis_port, decode_responses=True
+                host=self.redis_host,
+                port=self.redis_port,
+                decode_responses=True,
+                socket_keepalive=True,
+                health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
             )
             await self.redis.ping()
-            logging.info("Successfully connected to Redis")
+            logger.info("Successfully connected to Redis")
         except Exception as e:
-            logging.error(f"Failed to connect to Redis: {e}")
+            logger.error("Failed to connect to Redis: %s", e)
             raise
 
     async def disconnect(self):
@@ -56,16 +84,58 @@ class NotificationHandler:
         await pubsub.subscribe("new_apartments")
 
         try:
-            while self.running:
-                message = await pubsub.get_message(ignore_subscribe_messages=True)
-                if message and message["type"] == "message":
-                    data = json.loads(message["data"])
+            # listen() ждет сообщения на сокете Redis, без периодического опроса
+            async for message in pubsub.listen():
+                if not self.running:
+                    break
+                if message["type"] != "message":
+                    continue
+
+                # Забираем уже пришедшие уведомления, чтобы объединить их по пользователям
+                batch = [json.loads(message["data"])]
+                while len(batch) < NOTIFICATIONS_BATCH_SIZE:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=0
+                    )
+                    if message is None:
+                        break
+                    batch.append(json.loads(message["data"]))
+
+                # Одна квартира часто подходит многим пользователям из пачки,
+                # поэтому ее текст форматируется один раз
+                self.apartment_texts.clear()
+                for data in self._merge_notifications(batch):
                     await self.process_notification(data)
-                await asyncio.sleep(0.1)
         finally:
             await pubsub.unsubscribe("new_apartments")
             await self.disconnect()
 
+    @staticmethod
+    def _merge_notifications(batch: List[dict]) -> List[dict]:
+        """
+        Объединяет уведомления одного пользователя об одном типе жилья
+
+        Args:
+            batch (List[dict]): Уведомления в порядке получения
+
+        Returns:
+            List[dict]: Уведомления, в которых квартиры одного пользователя собраны вместе
+        """
+        merged: Dict[Tuple[int, Optional[str]], dict] = {}
+        notifications = []
+        for data in batch:
+            if data.get("type") != "user":
+                notifications.append(data)
+                continue
+
+            key = (data["user_id"], data.get("apartment_type"))
+            if key in merged:
+                merged[key]["apartments"].extend(data["apartments"])
+            else:
+                merged[key] = data
+                notifications.append(data)
+        return notifications
+
     async def process_notification(self, data: dict):
         """
         Process notification about new apartments
@@ -104,35 +174,16 @@ class NotificationHandler:
             apartment = apartments[0]
 
             # Формируем сообщение для одной квартиры
-            result_message = "🆕 Новая квартира по вашим критериям:\n\n"
-
-            if apartment.get("city"):
-                city_name = apartment["city"].capitalize()
-                result_message = (
-                    f"🆕 Новая квартира по вашим критериям в городе **{city_name}**:\n\n"
-                )
-
-            location = ""
-            if apartment.get("street"):
-                location = apartment["street"]
-
-            result_message += (
-                f"🏠 {apartment['rooms']}-комн., {apartment['square']} м²\n"
-            )
-            if location:
-                result_message += f"📍 {location}\n"
-
-            result_message += (
-                f"💰 *{int(apartment['price'])} тг*\n"
-                f"[Ссылка на объявление]({apartment['url']})\n\n"
-            )
+            result_message = NEW_APARTMENT_HEADER.format(
+                city_suffix=self._format_city_suffix(apartment)
+            ) + self._get_apartment_text(apartment, self._format_full_apartment_text)
 
             # Получаем фотографии для квартиры
             photos = None
             if apartment.get("id"):
-                photos = self.photo_manager.get_apartment_photos(apartment["id"])
-                logging.info(
-                    f"Found {len(photos)} photos for apartment {apartment['id']}"
+                photos = await self.photo_manager.get_apartment_photos(apartment["id"])
+                logger.info(
+                    "Found %s photos for apartment %s", len(photos), apartment["id"]
                 )
 
             # Отправляем сообщение с фотографиями
@@ -154,38 +205,21 @@ class NotificationHandler:
             for index in range(0, len(apartments), chunk_size)
         ]
 
+        # Паузу между сообщениями в один чат выдерживает MessageManager, не задерживая
+        # уведомления остальным пользователям
         for chunk in apartment_chunks:
-            # Проверяем, указан ли город у первой квартиры
-            result_message = "🆕 Новые квартиры по вашим критериям:\n\n"
-            first_apt = chunk[0]
-            if first_apt.get("city"):
-                # Используем название города с большой буквы
-                city_name = first_apt["city"].capitalize()
-                result_message = (
-                    f"🆕 Новые квартиры по вашим критериям в городе **{city_name}**:\n\n"
-                )
-
-            for apt in chunk:
-                location = ""
-                if apt.get("street"):
-                    location = apt["street"]
-
-                result_message += f"🏠 {apt['rooms']}-комн., {apt['square']} м²\n"
-                if location:
-                    result_message += f"📍 {location}\n"
-
-                result_message += (
-                    f"💰 *{int(apt['price'])} тг*\n"
-                    f"[Ссылка на объявление]({apt['url']})\n\n"
-                )
+            # Город в заголовке берем у первой квартиры
+            result_message = NEW_APARTMENTS_HEADER.format(
+                city_suffix=self._format_city_suffix(chunk[0])
+            ) + "".join(
+                self._get_apartment_text(apt, self._format_full_apartment_text)
+                for apt in chunk
+            )
 
             await self.message_manager.send_message(
                 self.bot, user_id, result_message, parse_mode=ParseMode.MARKDOWN
             )
 
-            # Небольшая пауза между сообщениями
-            await asyncio.sleep(1)
-
     async def _process_room_sharing_notification(self, user_id, apartments):
         """
         Обрабатывает уведомления о подселении
@@ -199,17 +233,20 @@ class NotificationHandler:
             apartment = apartments[0]
 
             # Формируем текст сообщения
-            message_text = "🆕 Новое объявление о подселении по вашим критериям:\n\n"
-            message_text += self._format_room_sharing_text(apartment)
+            message_text = NEW_ROOM_SHARING_HEADER + self._get_apartment_text(
+                apartment, self._format_room_sharing_text
+            )
 
             # Получаем фотографии для квартиры
             photos = None
             if apartment.get("id"):
-                photos = self.photo_manager.get_telegram_apartment_photos(
+                photos = await self.photo_manager.get_telegram_apartment_photos(
                     apartment["id"]
                 )
-                logging.info(
-                    f"Found {len(photos)} photos for telegram apartment {apartment['id']}"
+                logger.info(
+                    "Found %s photos for telegram apartment %s",
+                    len(photos),
+                    apartment["id"],
                 )
 
             # Отправляем сообщение с фотографиями
@@ -223,43 +260,93 @@ class NotificationHandler:
 
             return
 
-        # Разбиваем квартиры на группы, учитывая длину сообщения
-        current_message = (
-            "🆕 Найдены новые объявления о подселении по вашим критериям:\n\n"
-        )
-        current_apartments = []
+        # Разбиваем квартиры на группы, учитывая длину сообщения.
+        # Части сообщения собираются в список и склеиваются один раз
+        parts = [NEW_ROOM_SHARINGS_HEADER]
+        current_length = len(parts[0])
 
         for apartment in apartments:
             # Форматируем текст для текущего объявления
-            apartment_text = self._format_room_sharing_text(apartment)
+            apartment_text = self._get_apartment_text(
+                apartment, self._format_room_sharing_text
+            )
 
             # Проверяем, поместится ли объявление в текущее сообщение
-            if len(current_message) + len(apartment_text) <= MAX_MESSAGE_LENGTH:
-                current_message += apartment_text
-                current_apartments.append(apartment)
+            if current_length + len(apartment_text) <= MAX_MESSAGE_LENGTH:
+                parts.append(apartment_text)
+                current_length += len(apartment_text)
             else:
                 # Если не поместится, отправляем текущее сообщение и начинаем новое
                 await self.message_manager.send_message(
-                    self.bot, user_id, current_message, parse_mode=ParseMode.MARKDOWN
+                    self.bot, user_id, "".join(parts), parse_mode=ParseMode.MARKDOWN
                 )
 
-                # Небольшая пауза между сообщениями
-                await asyncio.sleep(1)
-
                 # Начинаем новое сообщение
-                current_message = "🆕 Новые объявления о подселении (продолжение):\n\n"
-                current_message += apartment_text
-                current_apartments = [apartment]
-
-        # Отправляем последнее сообщение, если оно не пустое
-        if (
-            current_message != "🆕 Новые объявления о подселении:\n\n"
-            and current_message != "🆕 Новые объявления о подселении (продолжение):\n\n"
-        ):
+                parts = [ROOM_SHARINGS_CONTINUATION_HEADER, apartment_text]
+                current_length = len(parts[0]) + len(apartment_text)
+
+        # Отправляем последнее сообщение, если в нем есть объявления
+        if len(parts) > 1:
             await self.message_manager.send_message(
-                self.bot, user_id, current_message, parse_mode=ParseMode.MARKDOWN
+                self.bot, user_id, "".join(parts), parse_mode=ParseMode.MARKDOWN
             )
 
+    @staticmethod
+    def _format_city_suffix(apartment):
+        """
+        Форматирует упоминание города для заголовка уведомления
+
+        Args:
+            apartment (dict): Данные квартиры
+
+        Returns:
+            str: Город с большой буквы или пустая строка, если город не указан
+        """
+        if not apartment.get("city"):
+            return ""
+        return CITY_SUFFIX_TEMPLATE.format(city_name=apartment["city"].capitalize())
+
+    def _get_apartment_text(
+        self, apartment: dict, formatter: Callable[[dict], str]
+    ) -> str:
+        """
+        Возвращает текст квартиры, форматируя его один раз на пачку уведомлений
+
+        Args:
+            apartment (dict): Данные квартиры
+            formatter (Callable[[dict], str]): Функция форматирования текста
+
+        Returns:
+            str: Отформатированный текст
+        """
+        apartment_id = apartment.get("id")
+        if apartment_id is None:
+            return formatter(apartment)
+
+        key = (formatter.__name__, apartment_id)
+        text = self.apartment_texts.get(key)
+        if text is None:
+            text = self.apartment_texts[key] = formatter(apartment)
+        return text
+
+    def _format_full_apartment_text(self, apartment):
+        """
+        Форматирует текст объявления о полной аренде
+
+        Args:
+            apartment (dict): Данные квартиры
+
+        Returns:
+            str: Отформатированный текст
+        """
+        location = f"📍 {street}\n" if (street := apartment.get("street")) else ""
+        return (
+            f"🏠 {apartment['rooms']}-комн., {apartment['square']} м²\n"
+            f"{location}"
+            f"💰 *{int(apartment['price'])} тг*\n"
+            f"[Ссылка на объявление]({apartment['url']})\n\n"
+        )
+
     def _format_room_sharing_text(self, apartment):
         """
         Форматирует текст объявления о подселении
@@ -276,11 +363,11 @@ class NotificationHandler:
             else "Не указана"
         )
 
-        message_text = (
+        parts = [
             f"🏢 *Подселение*\n"
             f"💰 *Цена:* {price}\n"
             f"📍 *Местоположение:* {apartment.get('location', 'Не указано')}\n"
-        )
+        ]
 
         if apartment.get("preferred_gender"):
             gender_text = {
@@ -289,10 +376,10 @@ class NotificationHandler:
                 "both": "Любой",
                 "no": "Не указано",
             }.get(apartment.get("preferred_gender"), "Не указано")
-            message_text += f"👤 *Предпочтительный пол:* {gender_text}\n"
+            parts.append(f"👤 *Предпочтительный пол:* {gender_text}\n")
 
         if apartment.get("contact"):
-            message_text += f"📞 *Контакт:* {apartment.get('contact')}\n"
+            parts.append(f"📞 *Контакт:* {apartment.get('contact')}\n")
 
         # Добавляем текст объявления, если он есть
         if apartment.get("text"):
@@ -300,7 +387,7 @@ class NotificationHandler:
             text = apartment.get("text")
             if len(text) > 200:  # Уменьшаем лимит для группировки
                 text = text[:197] + "..."
-            message_text += f"\n*Описание:*\n{text}\n"
+            parts.append(f"\n*Описание:*\n{text}\n")
 
         # Добавляем ссылку на оригинальное сообщение в Telegram
         if apartment.get("channel") and apartment.get("message_id"):
@@ -309,8 +396,10 @@ class NotificationHandler:
 
             channel_name = TELEGRAM_PARSE_GROUP_DICT.get(channel)
             if channel_name:
-                message_text += f"\n[Оригинальное объявление](https://t.me/{channel_name}/{message_id})\n\n"
+                parts.append(
+                    f"\n[Оригинальное объявление](https://t.me/{channel_name}/{message_id})\n\n"
+                )
         else:
-            message_text += "\n\n"
+            parts.append("\n\n")
 
-        return message_text
+        return "".join(parts)
@@ -0,0 +1,75 @@
+import logging
+import time
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Запрос не отправлен, так как сервис считается недоступным"""
+
+
+class CircuitBreaker:
+    """
+    Простой предохранитель для запросов к внешнему сервису.
+
+    После failure_threshold ошибок подряд запросы перестают отправляться на
+    reset_timeout секунд, затем пропускается пробный запрос
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        """
+        Args:
+            name (str): Название сервиса для логов
+            failure_threshold (int, optional): Количество ошибок подряд до размыкания. Defaults to 5.
+            reset_timeout (float, optional): Время в секундах до пробного запроса. Defaults to 30.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        # Время отправки пробного запроса в полуоткрытом состоянии
+        self.probe_started_at: Optional[float] = None
+
+    def allow_request(self) -> bool:
+        """
+        Проверить, можно ли отправить запрос
+
+        Returns:
+            bool: True, если предохранитель замкнут или пора сделать пробный запрос
+        """
+        if self.failures < self.failure_threshold:
+            return True
+
+        now = time.monotonic()
+        if now - self.opened_at < self.reset_timeout:
+            return False
+
+        # Полуоткрытое состояние: пропускаем только один пробный запрос. Если его
+        # результат так и не был учтен, через reset_timeout пропускаем следующий
+        if self.probe_started_at is not None and now - self.probe_started_at < self.reset_timeout:
+            return False
+        self.probe_started_at = now
+        return True
+
+    def record_success(self) -> None:
+        """Сбросить счетчик ошибок после успешного запроса"""
+        if self.failures >= self.failure_threshold:
+            logger.info("%s is available again", self.name)
+        self.failures = 0
+        self.probe_started_at = None
+
+    def record_failure(self) -> None:
+        """Учесть ошибку запроса и при необходимости разомкнуть предохранитель"""
+        self.failures += 1
+        self.probe_started_at = None
+        if self.failures >= self.failure_threshold:
+            if self.failures == self.failure_threshold:
+                logger.warning(
+                    "%s is unavailable, pausing requests for %s s",
+                    self.name,
+                    self.reset_timeout,
+                )
+            self.opened_at = time.monotonic()
@@ -8,6 +8,12 @@ class CityTypes:
     # Список всех доступных городов для подселения
     AVAILABLE_CITIES = [ALMATY, ASTANA]
 
+    # Названия городов без эмодзи
+    CITY_NAMES = {
+        ALMATY: "Алматы",
+        ASTANA: "Астана",
+    }
+
     @staticmethod
     def get_city_name_from_emoji(emoji_city: str) -> str:
         """
@@ -19,8 +25,4 @@ class CityTypes:
         Returns:
             str: Название города без эмодзи
         """
-        if emoji_city == CityTypes.ALMATY:
-            return "Алматы"
-        elif emoji_city == CityTypes.ASTANA:
-            return "Астана"
-        return ""
+        return CityTypes.CITY_NAMES.get(emoji_city, "")
@@ -21,10 +21,8 @@ class GenderTypes:
         FEMALE: "👩 Женский",
     }
 
-    GENDER_NAME_BY_DISPLAY = {
-        "👨 Мужской": MALE,
-        "👩 Женский": FEMALE,
-    }
+    # Обратное соответствие: отображаемое название -> тип пола
+    GENDER_NAME_BY_DISPLAY = {name: gender_type for gender_type, name in GENDER_DISPLAY_NAMES.items()}
 
     # Названия предпочтений по соседям для отображения
     PREFERENCE_DISPLAY_NAMES = {
@@ -33,6 +31,10 @@ class GenderTypes:
         NO_PREFERENCE: "👥 Без разницы",
     }
 
+    # Множества допустимых значений для быстрой проверки
+    ALL_GENDERS = frozenset({MALE, FEMALE})
+    ALL_PREFERENCES = frozenset({PREFER_MALE, PREFER_FEMALE, NO_PREFERENCE})
+
     @classmethod
     def get_gender_display_name(cls, gender_type: str) -> str:
         """
@@ -103,7 +105,7 @@ class GenderTypes:
         Returns:
             bool: True, если тип валидный
         """
-        return gender_type in cls.get_all_genders()
+        return gender_type in cls.ALL_GENDERS
 
     @classmethod
     def is_valid_preference(cls, preference_type: str) -> bool:
@@ -116,4 +118,4 @@ class GenderTypes:
         Returns:
             bool: True, если тип валидный
         """
-        return preference_type in cls.get_all_preferences()
+        return preference_type in cls.ALL_PREFERENCES
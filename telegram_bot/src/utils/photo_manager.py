@@ -1,154 +1,408 @@
+import asyncio
+import contextlib
 import logging
 import os
 import tempfile
-from typing import List
+import time
+from collections import OrderedDict
+from typing import AsyncContextManager, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
-import requests
+import aiohttp
 
-from src.env import SCRAPER_SERVICE_URL
+from env import PHOTOS_TEMP_DIR
+
+
+logger = logging.getLogger(__name__)
+
+# Фотографии одной квартиры запрашиваются повторно, когда она подходит многим
+# пользователям, поэтому пути к уже скачанным файлам кэшируются
+PHOTOS_CACHE_MAX_SIZE = 1024
+PHOTOS_CACHE_TTL = 60 * 60
+
+# Скачанные файлы фотографий переиспользуются по их адресу в API, самые давние
+# удаляются при превышении общего размера, как только их не ждет ни одно сообщение.
+# Лимит вдвое меньше shm_size в docker-compose, чтобы в tmpfs оставалось место
+# для вытесненных, но еще не отправленных файлов
+PHOTO_FILES_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+# Размер части фотографии, которая читается из ответа и пишется на диск за раз
+PHOTO_CHUNK_SIZE = 64 * 1024
+
+# Скачивание фотографии дольше обычного запроса к API, но зависший скрапер
+# не должен задерживать отправку сообщений надолго
+PHOTO_DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=15, connect=3, sock_read=5)
+
+# Расширения временных файлов по типу содержимого фотографии
+PHOTO_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+DEFAULT_PHOTO_EXTENSION = ".jpg"
 
 
 class PhotoManager:
     """Менеджер для работы с фотографиями квартир"""
 
-    def __init__(self):
+    def __init__(
+        self, request: Callable[..., AsyncContextManager[aiohttp.ClientResponse]]
+    ):
         """
         Инициализация менеджера фотографий
+
+        Args:
+            request (Callable[..., AsyncContextManager[aiohttp.ClientResponse]]): Отправка
+                запроса к API скрапера через предохранитель, KrishaBot.scraper_request
         """
-        pass
+        self.request = request
+        self.photos_cache: "OrderedDict[Tuple[str, int, int], Tuple[float, List[str]]]" = (
+            OrderedDict()
+        )
+        # Адрес фотографии -> путь к файлу и его размер
+        self.photo_files: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._photo_files_size = 0
+        # Скачивания, которые сейчас выполняются, по адресу фотографии
+        self._photo_downloads: Dict[str, "asyncio.Future[Optional[str]]"] = {}
+        # Сколько еще не отправленных сообщений использует каждый файл
+        self._photo_users: Dict[str, int] = {}
+        # Вытесненные из кэша файлы, которые удалятся после отправки сообщений
+        self._evicted_photos: Set[str] = set()
 
-    def get_apartment_photos(self, apartment_id: int, max_photos: int = 3) -> List[str]:
+    def _get_cached_photos(self, key: Tuple[str, int, int]) -> Optional[List[str]]:
         """
-        Получает фотографии квартиры из API скрапера
+        Получает пути к фотографиям из кэша
 
         Args:
-            apartment_id (int): ID квартиры
-            max_photos (int): Максимальное количество фотографий для возврата
+            key (Tuple[str, int, int]): Источник, ID квартиры и максимальное количество фотографий
 
         Returns:
-            List[str]: Список путей к временным файлам с фотографиями
+            Optional[List[str]]: Пути к файлам или None, если в кэше их нет или они устарели
         """
-        try:
-            # Запрашиваем фотографии через API
-            response = requests.get(
-                f"{SCRAPER_SERVICE_URL}/apartments/{apartment_id}/photos",
-                params={"max_photos": max_photos},
-            )
+        entry = self.photos_cache.get(key)
+        if entry is None:
+            return None
 
-            if not response.ok:
-                logging.error(
-                    f"Не удалось получить фотографии для квартиры {apartment_id}. Код статуса: {response.status_code}"
-                )
-                return []
+        expires_at, temp_files = entry
+        if expires_at < time.monotonic() or not all(map(os.path.exists, temp_files)):
+            del self.photos_cache[key]
+            return None
 
-            photos_data = response.json()
-            temp_files = []
+        self.photos_cache.move_to_end(key)
+        return temp_files
 
-            # Создаем временные файлы для каждой фотографии
-            for i, photo in enumerate(photos_data):
-                try:
-                    # Получаем бинарные данные фотографии
-                    photo_response = requests.get(
-                        f"{SCRAPER_SERVICE_URL}/apartments/photos/{photo['id']}"
-                    )
+    def _cache_photos(self, key: Tuple[str, int, int], temp_files: List[str]) -> None:
+        """
+        Сохраняет пути к скачанным фотографиям в кэш
 
-                    if not photo_response.ok:
-                        continue
+        Args:
+            key (Tuple[str, int, int]): Источник, ID квартиры и максимальное количество фотографий
+            temp_files (List[str]): Пути к временным файлам с фотографиями
+        """
+        # Пустой результат может быть временной ошибкой API, его не кэшируем
+        if not temp_files:
+            return
 
-                    # Определяем расширение файла
-                    content_type = photo_response.headers.get(
-                        "Content-Type", "image/jpeg"
-                    )
-                    ext = ".jpg"
-                    if "png" in content_type:
-                        ext = ".png"
-
-                    # Создаем временный файл
-                    fd, temp_path = tempfile.mkstemp(suffix=ext)
-                    with os.fdopen(fd, "wb") as tmp:
-                        tmp.write(photo_response.content)
-
-                    temp_files.append(temp_path)
-                    logging.info(
-                        f"Создан временный файл для фотографии {i+1} квартиры {apartment_id}: {temp_path}"
-                    )
-                except Exception as e:
-                    logging.error(
-                        f"Ошибка при создании временного файла для фотографии {i+1} квартиры {apartment_id}: {e}"
-                    )
+        self.photos_cache[key] = (time.monotonic() + PHOTOS_CACHE_TTL, temp_files)
+        self.photos_cache.move_to_end(key)
+        while len(self.photos_cache) > PHOTOS_CACHE_MAX_SIZE:
+            self.photos_cache.popitem(last=False)
 
-            return temp_files
+    def _cache_photo_file(self, url: str, temp_path: str, size: int) -> None:
+        """
+        Сохраняет путь к скачанному файлу фотографии и удаляет самые давние файлы
+
+        Args:
+            url (str): Путь к фотографии в API скрапера
+            temp_path (str): Путь к временному файлу с фотографией
+            size (int): Размер файла в байтах
+        """
+        self.photo_files[url] = (temp_path, size)
+        self._photo_files_size += size
+        while self._photo_files_size > PHOTO_FILES_CACHE_MAX_BYTES:
+            _, (old_path, old_size) = self.photo_files.popitem(last=False)
+            self._photo_files_size -= old_size
+            if old_path in self._photo_users:
+                # Файл еще ждет отправки, удалим его после release_photos
+                self._evicted_photos.add(old_path)
+            else:
+                self._remove_photo_file(old_path)
+
+    @staticmethod
+    def _remove_photo_file(temp_path: str) -> None:
+        """
+        Удаляет временный файл фотографии
+
+        Args:
+            temp_path (str): Путь к временному файлу с фотографией
+        """
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+
+    def _acquire_photos(self, temp_files: Iterable[str]) -> None:
+        """
+        Отмечает файлы как используемые сообщением, чтобы их не удалили до отправки
+
+        Args:
+            temp_files (Iterable[str]): Пути к временным файлам с фотографиями
+        """
+        for temp_path in temp_files:
+            self._photo_users[temp_path] = self._photo_users.get(temp_path, 0) + 1
+
+    def release_photos(self, temp_files: Iterable[str]) -> None:
+        """
+        Освобождает файлы после отправки сообщения и удаляет вытесненные из кэша
+
+        Каждый список, полученный из get_apartment_photos или
+        get_telegram_apartment_photos, должен быть освобожден один раз
+
+        Args:
+            temp_files (Iterable[str]): Пути к временным файлам с фотографиями
+        """
+        for temp_path in temp_files:
+            users = self._photo_users.get(temp_path, 0) - 1
+            if users > 0:
+                self._photo_users[temp_path] = users
+                continue
+
+            self._photo_users.pop(temp_path, None)
+            if temp_path in self._evicted_photos:
+                self._evicted_photos.discard(temp_path)
+                self._remove_photo_file(temp_path)
+
+    def remove_photo_files(self) -> None:
+        """
+        Удаляет все временные файлы с фотографиями при остановке бота
+
+        Сообщения, оставшиеся в очереди отправки, уже не освободят свои файлы,
+        поэтому удаляются все файлы независимо от счетчиков использования
+        """
+        temp_paths = {temp_path for temp_path, _ in self.photo_files.values()}
+        temp_paths.update(self._evicted_photos, self._photo_users)
+        for temp_path in temp_paths:
+            self._remove_photo_file(temp_path)
+
+        self.photos_cache.clear()
+        self.photo_files.clear()
+        self._photo_files_size = 0
+        self._evicted_photos.clear()
+        self._photo_users.clear()
+
+    async def _get_photo_file(self, url: str, description: str) -> Optional[str]:
+        """
+        Возвращает файл фотографии из кэша или скачивает ее
+
+        Args:
+            url (str): Путь к фотографии в API скрапера
+            description (str): Описание фотографии для логов
+
+        Returns:
+            Optional[str]: Путь к временному файлу или None, если скачать не удалось
+        """
+        # Фотография уже скачана для другой квартиры или другого запроса
+        cached_file = self.photo_files.get(url)
+        if cached_file is not None and os.path.exists(cached_file[0]):
+            self.photo_files.move_to_end(url)
+            return cached_file[0]
+
+        # Одновременные запросы одной фотографии ждут одно скачивание
+        download = self._photo_downloads.get(url)
+        if download is None:
+            download = asyncio.ensure_future(self._download_photo(url, description))
+            self._photo_downloads[url] = download
+            download.add_done_callback(lambda _: self._photo_downloads.pop(url, None))
+
+        # Отмена одного из ожидающих не должна прерывать скачивание для остальных
+        return await asyncio.shield(download)
+
+    async def _download_photo(self, url: str, description: str) -> Optional[str]:
+        """
+        Скачивает фотографию во временный файл в PHOTOS_TEMP_DIR, а если туда записать
+        не получилось (например, tmpfs переполнен) - в системный каталог временных файлов
+
+        Args:
+            url (str): Путь к фотографии в API скрапера
+            description (str): Описание фотографии для логов
+
+        Returns:
+            Optional[str]: Путь к временному файлу или None, если скачать не удалось
+        """
+        try:
+            try:
+                photo_file = await self._stream_photo(url, PHOTOS_TEMP_DIR)
+            except OSError as e:
+                # Сетевые ошибки aiohttp тоже наследуются от OSError, их не повторяем
+                if PHOTOS_TEMP_DIR is None or isinstance(e, aiohttp.ClientError):
+                    raise
+                logger.warning(
+                    "Не удалось записать фотографию в %s, используется системный каталог: %s",
+                    PHOTOS_TEMP_DIR,
+                    e,
+                )
+                photo_file = await self._stream_photo(url, None)
+
+            if photo_file is None:
+                return None
+
+            temp_path, size = photo_file
+            self._cache_photo_file(url, temp_path, size)
+            logger.info("Создан временный файл для фотографии %s: %s", description, temp_path)
+            return temp_path
         except Exception as e:
-            logging.error(
-                f"Ошибка при получении фотографий для квартиры {apartment_id}: {e}"
+            logger.error(
+                "Ошибка при создании временного файла для фотографии %s: %s",
+                description,
+                e,
             )
-            return []
+            return None
 
-    def get_telegram_apartment_photos(
-        self, apartment_id: int, max_photos: int = 3
+    async def _stream_photo(self, url: str, temp_dir: Optional[str]) -> Optional[Tuple[str, int]]:
+        """
+        Записывает фотографию во временный файл по частям по мере получения
+
+        Args:
+            url (str): Путь к фотографии в API скрапера
+            temp_dir (Optional[str]): Каталог для файла, None - системный каталог
+
+        Returns:
+            Optional[Tuple[str, int]]: Путь к временному файлу и его размер или None,
+                если API не вернул фотографию
+        """
+        # Получаем бинарные данные фотографии
+        async with self.request("GET", url, timeout=PHOTO_DOWNLOAD_TIMEOUT) as photo_response:
+            if not photo_response.ok:
+                return None
+
+            # Определяем расширение файла по уже разобранному aiohttp типу содержимого
+            ext = PHOTO_EXTENSIONS.get(photo_response.content_type, DEFAULT_PHOTO_EXTENSION)
+
+            # Пишем каждую часть в файл сразу после получения, не держа в памяти
+            # всю фотографию. Создание, запись и закрытие файла выполняются в
+            # отдельном потоке, чтобы не блокировать event loop
+            tmp = await asyncio.to_thread(tempfile.NamedTemporaryFile, suffix=ext, dir=temp_dir, delete=False)
+            size = 0
+            try:
+                async for chunk in photo_response.content.iter_chunked(PHOTO_CHUNK_SIZE):
+                    await asyncio.to_thread(tmp.write, chunk)
+                    size += len(chunk)
+                await asyncio.to_thread(tmp.close)
+            except BaseException:
+                # Удаляем недописанный файл
+                with contextlib.suppress(OSError):
+                    tmp.close()
+                self._remove_photo_file(tmp.name)
+                raise
+
+        return tmp.name, size
+
+    async def _fetch_photos(
+        self,
+        kind: str,
+        apartment_id: int,
+        list_url: str,
+        photo_url_prefix: str,
+        apartment_label: str,
+        max_photos: int,
     ) -> List[str]:
         """
-        Получает фотографии квартиры из Telegram через API скрапера
+        Получает фотографии квартиры из API скрапера и скачивает их во временные файлы
 
         Args:
-            apartment_id (int): ID квартиры из Telegram
+            kind (str): Источник квартиры для ключа кэша
+            apartment_id (int): ID квартиры
+            list_url (str): Путь к списку фотографий квартиры в API скрапера
+            photo_url_prefix (str): Путь к фотографиям в API скрапера без ID фотографии
+            apartment_label (str): Описание квартиры для логов
             max_photos (int): Максимальное количество фотографий для возврата
 
         Returns:
             List[str]: Список путей к временным файлам с фотографиями
         """
+        cache_key = (kind, apartment_id, max_photos)
+        cached_photos = self._get_cached_photos(cache_key)
+        if cached_photos is not None:
+            self._acquire_photos(cached_photos)
+            return cached_photos
+
         try:
             # Запрашиваем фотографии через API
-            response = requests.get(
-                f"{SCRAPER_SERVICE_URL}/telegram/apartments/{apartment_id}/photos",
-                params={"max_photos": max_photos},
-            )
-
-            if not response.ok:
-                logging.error(
-                    f"Не удалось получить фотографии для Telegram квартиры {apartment_id}. Код статуса: {response.status_code}"
-                )
-                return []
-
-            photos_data = response.json()
-            temp_files = []
-
-            # Создаем временные файлы для каждой фотографии
-            for i, photo in enumerate(photos_data):
-                try:
-                    # Получаем бинарные данные фотографии
-                    photo_response = requests.get(
-                        f"{SCRAPER_SERVICE_URL}/telegram/photos/{photo['id']}"
+            async with self.request(
+                "GET", list_url, params={"max_photos": max_photos}
+            ) as response:
+                if not response.ok:
+                    logger.error(
+                        "Не удалось получить фотографии для %s. Код статуса: %s",
+                        apartment_label,
+                        response.status,
                     )
+                    return []
 
-                    if not photo_response.ok:
-                        continue
+                photos_data = await response.json()
 
-                    # Определяем расширение файла
-                    content_type = photo_response.headers.get(
-                        "Content-Type", "image/jpeg"
-                    )
-                    ext = ".jpg"
-                    if "png" in content_type:
-                        ext = ".png"
-
-                    # Создаем временный файл
-                    fd, temp_path = tempfile.mkstemp(suffix=ext)
-                    with os.fdopen(fd, "wb") as tmp:
-                        tmp.write(photo_response.content)
-
-                    temp_files.append(temp_path)
-                    logging.info(
-                        f"Создан временный файл для фотографии {i+1} Telegram квартиры {apartment_id}: {temp_path}"
-                    )
-                except Exception as e:
-                    logging.error(
-                        f"Ошибка при создании временного файла для фотографии {i+1} Telegram квартиры {apartment_id}: {e}"
+            # Скачиваем все фотографии одновременно
+            async with asyncio.TaskGroup() as task_group:
+                tasks = [
+                    task_group.create_task(
+                        self._get_photo_file(
+                            f"{photo_url_prefix}/{photo['id']}",
+                            f"{i+1} {apartment_label}",
+                        )
                     )
+                    for i, photo in enumerate(photos_data)
+                ]
+            temp_files = [task.result() for task in tasks if task.result()]
 
+            self._cache_photos(cache_key, temp_files)
+            self._acquire_photos(temp_files)
             return temp_files
         except Exception as e:
-            logging.error(
-                f"Ошибка при получении фотографий для Telegram квартиры {apartment_id}: {e}"
+            logger.error(
+                "Ошибка при получении фотографий для %s: %s", apartment_label, e
             )
             return []
+
+    async def get_apartment_photos(
+        self, apartment_id: int, max_photos: int = 3
+    ) -> List[str]:
+        """
+        Получает фотографии квартиры из API скрапера
+
+        Args:
+            apartment_id (int): ID квартиры
+            max_photos (int): Максимальное количество фотографий для возврата
+
+        Returns:
+            List[str]: Список путей к временным файлам с фотографиями, после отправки
+                их нужно освободить через release_photos
+        """
+        return await self._fetch_photos(
+            "apartment",
+            apartment_id,
+            f"/apartments/{apartment_id}/photos",
+            "/apartments/photos",
+            f"квартиры {apartment_id}",
+            max_photos,
+        )
+
+    async def get_telegram_apartment_photos(
+        self, apartment_id: int, max_photos: int = 3
+    ) -> List[str]:
+        """
+        Получает фотографии квартиры из Telegram через API скрапера
+
+        Args:
+            apartment_id (int): ID квартиры из Telegram
+            max_photos (int): Максимальное количество фотографий для возврата
+
+        Returns:
+            List[str]: Список путей к временным файлам с фотографиями, после отправки
+                их нужно освободить через release_photos
+        """
+        return await self._fetch_photos(
+            "telegram",
+            apartment_id,
+            f"/telegram/apartments/{apartment_id}/photos",
+            "/telegram/photos",
+            f"Telegram квартиры {apartment_id}",
+            max_photos,
+        )
@@ -15,11 +15,17 @@ class RentalTypes:
         ROOM_SHARING: "👥 Подселение",
     }
 
+    # Обратное соответствие: отображаемое название -> тип съёма
+    TYPES_BY_DISPLAY_NAME = {name: rental_type for rental_type, name in DISPLAY_NAMES.items()}
+
     DISPLAY_PREVIEW_NAMES = {
         FULL_APARTMENT: "Жильё целиком",
         ROOM_SHARING: "Подселение",
     }
 
+    # Множество допустимых типов съёма для быстрой проверки
+    ALL_TYPES = frozenset({FULL_APARTMENT, ROOM_SHARING})
+
     @classmethod
     def get_display_name(cls, rental_type: str) -> str:
         """
@@ -67,4 +73,4 @@ class RentalTypes:
         Returns:
             bool: True, если тип валидный
         """
-        return rental_type in cls.get_all_types()
+        return rental_type in cls.ALL_TYPES
@@ -12,14 +12,15 @@ async def main():
         # loop=telethon_loop,
     )
 
+    # Авторизация сохраняется в файле сессии, поэтому повторные запуски
+    # переиспользуют его и не запрашивают код заново. Ошибки входа не
+    # подавляем, чтобы было видно, почему не удалось подключиться
+    await telegram_client.start(phone=TELEGRAM_PHONE_NUMBER)
     try:
-        await telegram_client.start(
-            phone=TELEGRAM_PHONE_NUMBER,
-        )
-    except Exception as e:
-        stas = 1
-
-    dialogs = await telegram_client.get_dialogs(5)
+        me = await telegram_client.get_me()
+        print(f"id: {me.id}, username: {me.username}, phone: {me.phone}")
+    finally:
+        await telegram_client.disconnect()
 
 
 if __name__ == '__main__':